@@ -0,0 +1,92 @@
+### bench_copy.py
+# Times each copy strategy in vfs_copy on files of several sizes. Strategies
+# the filesystem cannot do are reported as unsupported rather than falling back.
+import os
+import sys
+import time
+import shutil
+import argparse
+import tempfile
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from vfs_copy import STRATEGIES, COPIERS, O_BINARY
+
+SIZES = {"4K": 4 * 1024, "1M": 1024 * 1024, "16M": 16 * 1024 * 1024, "256M": 256 * 1024 * 1024}
+
+
+def make_file(path, size):
+    block = os.urandom(min(size, 1024 * 1024))
+    with open(path, "wb") as file:
+        remaining = size
+        while remaining:
+            file.write(block[:remaining])
+            remaining -= min(remaining, len(block))
+
+
+def time_strategy(strategy, src, dst, repeat):
+    best = None
+    for _ in range(repeat):
+        src_fd = os.open(src, os.O_RDONLY | O_BINARY)
+        dst_fd = os.open(dst, os.O_WRONLY | os.O_CREAT | os.O_TRUNC | O_BINARY, 0o644)
+        try:
+            started = time.perf_counter()
+            COPIERS[strategy](src_fd, dst_fd, os.fstat(src_fd).st_size)
+            os.fsync(dst_fd)
+            elapsed = time.perf_counter() - started
+        finally:
+            os.close(src_fd)
+            os.close(dst_fd)
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+
+def time_shutil(src, dst, repeat):
+    best = None
+    for _ in range(repeat):
+        started = time.perf_counter()
+        shutil.copyfile(src, dst)
+        with open(dst, "rb+") as file:
+            os.fsync(file.fileno())
+        elapsed = time.perf_counter() - started
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Copy strategy benchmark")
+    parser.add_argument("--sizes", nargs="+", default=list(SIZES), choices=list(SIZES))
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--dir", help="where to put the files (default: a temp dir)")
+    parser.add_argument("--dest-dir", help="copy into another filesystem")
+    args = parser.parse_args()
+
+    work_dir = tempfile.mkdtemp(prefix="vfs-copy-", dir=args.dir)
+    dest_dir = tempfile.mkdtemp(prefix="vfs-copy-", dir=args.dest_dir) if args.dest_dir else work_dir
+    try:
+        print(f"{'size':>6}  " + "  ".join(f"{name:>15}" for name in STRATEGIES + ("shutil",)))
+        for label in args.sizes:
+            size = SIZES[label]
+            src = os.path.join(work_dir, f"src-{label}")
+            dst = os.path.join(dest_dir, f"dst-{label}")
+            make_file(src, size)
+            cells = []
+            for strategy in STRATEGIES:
+                try:
+                    elapsed = time_strategy(strategy, src, dst, args.repeat)
+                    cells.append(f"{size / elapsed / 1e6:>10.0f} MB/s")
+                except OSError:
+                    cells.append(f"{'unsupported':>15}")
+            elapsed = time_shutil(src, dst, args.repeat)
+            cells.append(f"{size / elapsed / 1e6:>10.0f} MB/s")
+            print(f"{label:>6}  " + "  ".join(cells))
+            os.remove(src)
+            os.remove(dst)
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+        if dest_dir != work_dir:
+            shutil.rmtree(dest_dir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,98 @@
+### bench_indexer.py
+# Times a full metadata scan of a synthetic tree with the old os.walk + os.stat
+# walker and with the parallel scandir indexer, and checks both agree.
+import os
+import sys
+import time
+import shutil
+import argparse
+import tempfile
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from vfs_indexer import ParallelIndexer
+from vfs_metadata import IGNORED_DIRS
+
+
+def build_tree(root, files, fanout, per_dir):
+    # Spreads `files` empty files over a tree `fanout` directories wide
+    created = 0
+    directory = 0
+    while created < files:
+        path = root
+        n = directory
+        while True:
+            path = os.path.join(path, f"d{n % fanout}")
+            n //= fanout
+            if n == 0:
+                break
+        os.makedirs(path, exist_ok=True)
+        for i in range(min(per_dir, files - created)):
+            open(os.path.join(path, f"f{i}.txt"), "wb").close()
+        created += per_dir
+        directory += 1
+
+
+def walk_stat(root):
+    # The walker MetadataManager used before the parallel indexer
+    result = {}
+    for dirpath, dirs, files in os.walk(root):
+        dirs[:] = [d for d in dirs if d not in IGNORED_DIRS]
+        for file in files:
+            path = os.path.join(dirpath, file)
+            try:
+                stats = os.stat(path)
+            except OSError:
+                continue
+            result[path] = (stats.st_size, stats.st_ctime, stats.st_mtime)
+    return result
+
+
+def parallel_scan(root, workers):
+    result = {}
+
+    def on_batch(rows):
+        result.update((path, (size, ctime, mtime)) for path, size, ctime, mtime in rows)
+
+    ParallelIndexer(root, IGNORED_DIRS, workers, on_batch).run()
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Metadata indexer benchmark")
+    parser.add_argument("--files", type=int, default=1000000)
+    parser.add_argument("--fanout", type=int, default=16)
+    parser.add_argument("--per-dir", type=int, default=200)
+    parser.add_argument("--workers", type=int, default=None)
+    parser.add_argument("--root", help="reuse an existing tree instead of building one")
+    args = parser.parse_args()
+
+    root = args.root
+    if root is None:
+        root = tempfile.mkdtemp(prefix="vfs-indexer-")
+        started = time.perf_counter()
+        build_tree(root, args.files, args.fanout, args.per_dir)
+        print(f"built {args.files} files in {time.perf_counter() - started:.1f}s under {root}")
+    try:
+        started = time.perf_counter()
+        walked = walk_stat(root)
+        walk_time = time.perf_counter() - started
+        print(f"os.walk + os.stat: {len(walked)} files in {walk_time:.2f}s")
+
+        started = time.perf_counter()
+        scanned = parallel_scan(root, args.workers)
+        scan_time = time.perf_counter() - started
+        print(f"parallel scandir:  {len(scanned)} files in {scan_time:.2f}s "
+              f"({walk_time / scan_time:.1f}x)")
+
+        if walked.keys() != scanned.keys():
+            print("FAIL: the two scans found different files")
+            sys.exit(1)
+        print("OK")
+    finally:
+        if args.root is None:
+            shutil.rmtree(root, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
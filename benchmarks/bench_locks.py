@@ -0,0 +1,83 @@
+### bench_locks.py
+# Measures VFS throughput as threads are added, with reads spread over many
+# files and a share of updates mixed in, for sharded per-file locks and for a
+# single global lock (one shard, every operation exclusive).
+import os
+import sys
+import time
+import random
+import argparse
+import tempfile
+import threading
+from contextlib import contextmanager
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from vfs_core import VFS
+
+
+class GlobalLock:
+    # Stand-in for the lock table that lets only one operation run at a time
+    def __init__(self):
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def read(self, path):
+        with self._lock:
+            yield
+
+    write = read
+
+
+def run(vfs, names, threads, seconds, write_ratio):
+    counts = [0] * threads
+    deadline = time.perf_counter() + seconds
+
+    def worker(index):
+        rng = random.Random(index)
+        while time.perf_counter() < deadline:
+            name = rng.choice(names)
+            if rng.random() < write_ratio:
+                vfs.update_file(name, f"update from {index} at {time.perf_counter()}\n" * 64)
+            else:
+                # Bypass the content cache so every read touches the disk
+                vfs.read_range(name, 0, 64 * 1024)
+            counts[index] += 1
+
+    workers = [threading.Thread(target=worker, args=(i,)) for i in range(threads)]
+    for thread in workers:
+        thread.start()
+    for thread in workers:
+        thread.join()
+    return sum(counts) / seconds
+
+
+def main():
+    parser = argparse.ArgumentParser(description="VFS lock scaling benchmark")
+    parser.add_argument("--files", type=int, default=256)
+    parser.add_argument("--seconds", type=float, default=2.0)
+    parser.add_argument("--write-ratio", type=float, default=0.05)
+    parser.add_argument("--threads", type=int, nargs="+", default=[1, 2, 4, 8, 16])
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as root:
+        vfs = VFS(root)
+        names = [f"file_{i}.txt" for i in range(args.files)]
+        for name in names:
+            vfs.create_file(name, "initial line\n" * 4096)
+        sharded = vfs.locks
+        # Threads only overlap on disk waits when there is a single core
+        print(f"{os.cpu_count()} CPUs, {args.files} files, {args.write_ratio:.0%} updates")
+        print(f"{'threads':>7}  {'per-file ops/s':>14}  {'global ops/s':>12}")
+        for threads in args.threads:
+            vfs.locks = sharded
+            per_file = run(vfs, names, threads, args.seconds, args.write_ratio)
+            vfs.locks = GlobalLock()
+            global_lock = run(vfs, names, threads, args.seconds, args.write_ratio)
+            print(f"{threads:>7}  {per_file:>14.0f}  {global_lock:>12.0f}")
+        vfs.locks = sharded
+        vfs.close()
+
+
+if __name__ == "__main__":
+    main()
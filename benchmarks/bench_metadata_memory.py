@@ -0,0 +1,65 @@
+### bench_metadata_memory.py
+# Measures how many bytes the metadata cache spends per file, comparing the
+# old dict-of-dicts layout with the columnar MetadataStore.
+import os
+import sys
+import gc
+import time
+import argparse
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from vfs_columns import MetadataStore
+
+
+def synthetic_rows(files, per_dir):
+    now = time.time()
+    for i in range(files):
+        directory = f"/srv/share/projects/p{i // (per_dir * 50)}/d{i // per_dir}"
+        yield f"{directory}/file_{i}.dat", i * 37 % 10000000, now - i, now - i / 2
+
+
+def dict_cache(rows):
+    # The layout MetadataManager used before the columnar store
+    return {
+        path: {
+            "size": size,
+            "creation_time": time.ctime(ctime),
+            "modification_time": time.ctime(mtime),
+        }
+        for path, size, ctime, mtime in rows
+    }
+
+
+def measure(build, rows):
+    gc.collect()
+    tracemalloc.start()
+    cache = build(rows)
+    gc.collect()
+    used = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    return cache, used
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Metadata cache memory benchmark")
+    parser.add_argument("--files", type=int, default=1000000)
+    parser.add_argument("--per-dir", type=int, default=200)
+    args = parser.parse_args()
+
+    # Rows are generated while tracing, so each layout pays for the strings it keeps
+    cache, before = measure(dict_cache, synthetic_rows(args.files, args.per_dir))
+    del cache
+    store, after = measure(MetadataStore, synthetic_rows(args.files, args.per_dir))
+    if len(store) != args.files:
+        print("FAIL: store lost entries")
+        sys.exit(1)
+
+    print(f"files: {args.files}")
+    print(f"dict of dicts:  {before / args.files:7.1f} bytes/file")
+    print(f"MetadataStore:  {after / args.files:7.1f} bytes/file  ({before / after:.1f}x smaller)")
+
+
+if __name__ == "__main__":
+    main()
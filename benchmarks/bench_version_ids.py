@@ -0,0 +1,90 @@
+### bench_version_ids.py
+# Hammers VFS.update_file from many threads and processes at once and checks
+# that every update produced its own version and that no content was lost.
+import os
+import sys
+import time
+import argparse
+import tempfile
+import threading
+import multiprocessing
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from vfs_core import VFS
+
+FILE_NAME = "stress.txt"
+
+
+def run_writer(root, writer_id, updates):
+    vfs = VFS(root)
+    for i in range(updates):
+        vfs.update_file(FILE_NAME, f"writer {writer_id} update {i}\n")
+    vfs.close()
+
+
+def run_process(root, process_id, threads, updates):
+    workers = [
+        threading.Thread(target=run_writer, args=(root, f"{process_id}.{t}", updates))
+        for t in range(threads)
+    ]
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Concurrent update_file stress test")
+    parser.add_argument("--processes", type=int, default=4)
+    parser.add_argument("--threads", type=int, default=4)
+    parser.add_argument("--updates", type=int, default=50)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as root:
+        vfs = VFS(root)
+        vfs.create_file(FILE_NAME, "initial\n")
+
+        started = time.perf_counter()
+        processes = [
+            multiprocessing.Process(target=run_process, args=(root, p, args.threads, args.updates))
+            for p in range(args.processes)
+        ]
+        for process in processes:
+            process.start()
+        for process in processes:
+            process.join()
+        elapsed = time.perf_counter() - started
+
+        expected = args.processes * args.threads * args.updates
+        rows = vfs.versions.list_versions(FILE_NAME)
+        seqs = [row["seq"] for row in rows]
+        ids = {row["version_id"] for row in rows}
+
+        written = {"initial\n"}
+        for p in range(args.processes):
+            for t in range(args.threads):
+                for i in range(args.updates):
+                    written.add(f"writer {p}.{t} update {i}\n")
+        seen = {vfs.read_file(FILE_NAME)}
+        seen.update(vfs.versions.read_version(row["version_id"]).decode("utf-8") for row in rows)
+
+        print(f"updates: {expected}  versions: {len(rows)}  elapsed: {elapsed:.2f}s  "
+              f"({expected / elapsed:.0f} updates/s)")
+        ok = True
+        if len(rows) != expected or len(ids) != expected:
+            print("FAIL: versions were lost or overwritten")
+            ok = False
+        if seqs != list(range(1, expected + 1)):
+            print("FAIL: version sequence numbers are not contiguous and increasing")
+            ok = False
+        if seen != written:
+            print(f"FAIL: {len(written - seen)} written contents missing from history")
+            ok = False
+        print("OK" if ok else "FAILED")
+        vfs.close()
+        sys.exit(0 if ok else 1)
+
+
+if __name__ == "__main__":
+    main()
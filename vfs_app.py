@@ -1,12 +1,20 @@
 ### futuristic_vfs_app.py
 import os
-import shutil
 import ttkbootstrap as ttk
 from ttkbootstrap.constants import *
 from tkinter import messagebox, filedialog
 from vfs_core import VFS
+from vfs_fulltext import ContentIndex
+from vfs_dedupe import DuplicateFinder
+from vfs_jobs import JobScheduler
+from vfs_metadata import IGNORED_DIRS
 from tkinter import Listbox, Text
 
+TREE_CHUNK = 500
+# Trash retention the app starts with; changed from Trash > Retention Settings
+TRASH_MAX_AGE_DAYS = 30
+TRASH_MAX_MB = 1024
+
 
 
 
@@ -50,7 +58,9 @@ class VFSApp:
         self.root.resizable(False, False)
         # self.root.iconbitmap(default="favicon.ico")
 
-        self.vfs = VFS()
+        self.vfs = VFS(trash_max_age=TRASH_MAX_AGE_DAYS * 86400, trash_max_bytes=TRASH_MAX_MB * 1024 * 1024)
+        # Indexed in the background; kept current through the VFS listener hook
+        self.content_index = ContentIndex(self.vfs)
 
         self.style = ttk.Style("darkly")
         font_header = ("Courier New", 18, "bold")
@@ -66,6 +76,7 @@ class VFSApp:
         filemenu.add_command(label="Search File", command=self.search_file)
         filemenu.add_separator()
         filemenu.add_command(label="Set Shared Directory", command=self.set_shared_directory)
+        filemenu.add_command(label="Cancel Background Jobs", command=lambda: self.jobs.cancel_all())
         filemenu.add_command(label="Exit", command=self.on_exit)
         menubar.add_cascade(label="\u2699 File Ops", menu=filemenu)
 
@@ -75,6 +86,7 @@ class VFSApp:
 
         trash_menu = ttk.Menu(menubar, tearoff=0)
         trash_menu.add_command(label="View Trash Bin", command=self.view_trash_bin)
+        trash_menu.add_command(label="Retention Settings", command=self.trash_settings)
         menubar.add_cascade(label="🗑️ Trash", menu=trash_menu)
 
         tree_menu = ttk.Menu(menubar, tearoff=0)
@@ -154,14 +166,64 @@ class VFSApp:
         )
         self.status.pack(side="bottom", fill="x")
 
+        self.job_status = ttk.Label(
+            self.root,
+            text="Jobs: idle",
+            font=("Consolas", 9),
+            anchor="e",
+            bootstyle="inverse-dark",
+            relief="ridge"
+        )
+        self.job_status.pack(side="bottom", fill="x")
+
+        # Disk work runs here so the mainloop never waits on I/O
+        self.jobs = JobScheduler(self.root, on_change=self.update_job_status)
+        self.tree_cache = {}
+        self.run_job("Index contents", self.content_index.build)
+
         self.root.protocol("WM_DELETE_WINDOW", self.on_exit)
 
     def change_theme(self, theme):
         self.style.theme_use(theme)
         self.status.config(text=f"Theme changed to: {theme}")
 
+    def update_job_status(self, counts):
+        if counts["queued"] or counts["running"]:
+            self.job_status.config(text=f"Jobs: {counts['running']} running, {counts['queued']} queued")
+        else:
+            self.job_status.config(text="Jobs: idle")
+
+    def run_job(self, name, func, *args, on_done=None, on_error=None, **options):
+        # Runs func(*args) off the Tk thread; callbacks come back on it
+        if on_error is None:
+            on_error = lambda e: messagebox.showerror("Error", str(e))
+        return self.jobs.submit(name, func, *args, on_done=on_done, on_error=on_error, **options)
+
+    def list_directory(self, path):
+        # Runs on a worker. Listings are cached until the directory's mtime moves,
+        # so reopening a node only costs one stat.
+        mtime = os.stat(path).st_mtime_ns
+        cached = self.tree_cache.get(path)
+        if cached is not None and cached[0] == mtime:
+            return cached
+        entries = []
+        with os.scandir(path) as it:
+            for entry in it:
+                if entry.name in IGNORED_DIRS:
+                    continue
+                try:
+                    entries.append((entry.name, entry.is_dir()))
+                except OSError:
+                    continue
+        entries.sort(key=lambda item: (not item[1], item[0].lower()))
+        listing = self.tree_cache[path] = (mtime, entries)
+        return listing
+
     def on_exit(self):
         if messagebox.askokcancel("Exit", "Are you sure you want to exit?"):
+            self.jobs.shutdown()
+            self.content_index.close()
+            self.vfs.close()
             self.root.quit()
 
     def view_file_versions(self):
@@ -191,42 +253,57 @@ class VFSApp:
                 text="Restore Selected Version",
                 bootstyle="warning-outline",
                 command=lambda: restore_version(version_list)
-            ).pack(pady=5)
+            ).pack(side=LEFT, padx=5, pady=5)
+            ttk.Button(
+                button_frame,
+                text="Load More",
+                bootstyle="info-outline",
+                command=lambda: load_page()
+            ).pack(side=LEFT, padx=5, pady=5)
+
+            page_size = 200
+            loaded = {"name": None}
+
+            def load_page(first=False):
+                if loaded["name"] is None:
+                    return
+                fname = loaded["name"]
+
+                def show(versions):
+                    for v in versions:
+                        version_list.insert(END, v)
+                    if first and not versions:
+                        messagebox.showinfo("No Versions", f"No versions found for '{fname}'.")
+
+                self.run_job(f"Versions of {fname}", self.vfs.get_file_versions, fname,
+                             version_list.size(), page_size, on_done=show)
 
             def fetch_versions(fname):
-                versions = self.vfs.get_file_versions(fname)
+                loaded["name"] = fname
                 version_list.delete(0, 'end')
                 content_area.delete("1.0", END)
-                if versions:
-                    for v in versions:
-                        version_list.insert(END, v)
-                else:
-                    messagebox.showinfo("No Versions", f"No versions found for '{fname}'.")
+                load_page(first=True)
 
             def show_version_content(evt):
                 selected = version_list.curselection()
                 if selected:
                     version_path = version_list.get(selected[0])
-                    try:
-                        with open(version_path, "r") as f:
-                            content = f.read()
+
+                    def show(content):
                         content_area.delete("1.0", END)
                         content_area.insert("1.0", content)
-                    except Exception as e:
-                        messagebox.showerror("Error", str(e))
+
+                    self.run_job("Read version", self.vfs.read_version, version_path, on_done=show)
 
             def restore_version(vlist):
                 selected = vlist.curselection()
                 if selected:
                     version_path = vlist.get(selected[0])
-                    target_name = os.path.basename(version_path).split("_v")[0]
-                    try:
-                        with open(version_path, "r") as vfile:
-                            data = vfile.read()
-                        self.vfs.update_file(target_name, data)
-                        messagebox.showinfo("Success", f"'{target_name}' restored from version.")
-                    except Exception as e:
-                        messagebox.showerror("Error", str(e))
+                    self.run_job(
+                        "Restore version", self.vfs.restore_version, version_path,
+                        on_done=lambda target_name: messagebox.showinfo(
+                            "Success", f"'{target_name}' restored from version."),
+                    )
 
             version_list.bind("<<ListboxSelect>>", show_version_content)
 
@@ -828,6 +905,7 @@ class VFSApp:
     
     def view_trash_bin(self):
         def layout(dialog):
+            import time
             from tkinter import Listbox
 
             frame = ttk.Frame(dialog, padding=10)
@@ -836,40 +914,47 @@ class VFSApp:
             trash_list = Listbox(frame, height=10)
             trash_list.pack(fill=BOTH, expand=True, padx=5, pady=5)
 
+            entries = []
+
             def load_trash():
-                trash_list.delete(0, END)
-                trashed_files = self.vfs.list_trashed_files()
-                if trashed_files:
-                    for f in trashed_files:
-                        trash_list.insert(END, f)
-                else:
-                    trash_list.insert(END, "<Trash is empty>")
+                def show(rows):
+                    trash_list.delete(0, END)
+                    entries[:] = rows
+                    if entries:
+                        for entry in entries:
+                            trash_list.insert(
+                                END,
+                                f"{entry['original_name']}  ({entry['size']} bytes, deleted {time.ctime(entry['deleted_at'])})"
+                            )
+                    else:
+                        trash_list.insert(END, "<Trash is empty>")
 
-            def restore_selected():
+                self.run_job("Load trash", self.vfs.list_trashed_files, on_done=show)
+
+            def selected_entry():
                 selected = trash_list.curselection()
-                if selected:
-                    fname = trash_list.get(selected[0])
-                    if "Trash is empty" in fname:
-                        return
-                    try:
-                        self.vfs.restore_file(fname)
+                if selected and selected[0] < len(entries):
+                    return entries[selected[0]]
+                return None
+
+            def restore_selected():
+                entry = selected_entry()
+                if entry:
+                    def done(fname):
                         messagebox.showinfo("Success", f"'{fname}' restored.")
                         load_trash()
-                    except Exception as e:
-                        messagebox.showerror("Error", str(e))
+
+                    self.run_job("Restore file", self.vfs.restore_file, entry["trash_id"], on_done=done)
 
             def delete_selected():
-                selected = trash_list.curselection()
-                if selected:
-                    fname = trash_list.get(selected[0])
-                    if "Trash is empty" in fname:
-                        return
-                    try:
-                        self.vfs.permanently_delete_file(fname)
-                        messagebox.showinfo("Deleted", f"'{fname}' permanently removed.")
+                entry = selected_entry()
+                if entry:
+                    def done(_):
+                        messagebox.showinfo("Deleted", f"'{entry['original_name']}' permanently removed.")
                         load_trash()
-                    except Exception as e:
-                        messagebox.showerror("Error", str(e))
+
+                    self.run_job("Delete permanently", self.vfs.permanently_delete_file, entry["trash_id"],
+                                 on_done=done)
 
             ttk.Button(frame, text="Restore", bootstyle="success-outline", command=restore_selected).pack(pady=5)
             ttk.Button(frame, text="Delete Permanently", bootstyle="danger-outline", command=delete_selected).pack(pady=5)
@@ -880,6 +965,45 @@ class VFSApp:
         self.show_dialog("Trash Bin", layout)
 
 
+    def trash_settings(self):
+        def layout(dialog):
+            frame = ttk.Frame(dialog, padding=10)
+            max_age = self.vfs.trash_max_age
+            max_bytes = self.vfs.trash_max_bytes
+
+            ttk.Label(frame, text="Delete trashed files after (days, blank for never):").pack(pady=5)
+            age_entry = ttk.Entry(frame, width=20)
+            age_entry.insert(0, "" if max_age is None else f"{max_age / 86400:g}")
+            age_entry.pack()
+
+            ttk.Label(frame, text="Keep the trash under (MB, blank for no limit):").pack(pady=5)
+            size_entry = ttk.Entry(frame, width=20)
+            size_entry.insert(0, "" if max_bytes is None else f"{max_bytes / (1024 * 1024):g}")
+            size_entry.pack()
+
+            def save():
+                try:
+                    days = float(age_entry.get()) if age_entry.get().strip() else None
+                    megabytes = float(size_entry.get()) if size_entry.get().strip() else None
+                except ValueError:
+                    messagebox.showerror("Error", "Limits must be numbers.")
+                    return
+
+                def done(_):
+                    self.status.config(text="Trash retention updated")
+                    dialog.destroy()
+
+                self.run_job("Trash limits", self.vfs.set_trash_limits,
+                             None if days is None else days * 86400,
+                             None if megabytes is None else int(megabytes * 1024 * 1024),
+                             on_done=done)
+
+            ttk.Button(frame, text="Save", command=save, bootstyle="success-outline").pack(pady=10)
+            return frame
+
+        self.show_dialog("Trash Retention", layout)
+
+
     def open_directory_tree(self):
         import os
         from ttkbootstrap import Treeview
@@ -891,36 +1015,82 @@ class VFSApp:
             tree = Treeview(frame)
             tree.pack(fill=BOTH, expand=True)
 
-            def populate_tree(parent, path):
-                try:
-                    for entry in os.listdir(path):
-                        full_path = os.path.join(path, entry)
-                        is_dir = os.path.isdir(full_path)
-                        node = tree.insert(parent, "end", text=entry, open=False)
-                        if is_dir:
-                            populate_tree(node, full_path)
-                except PermissionError:
-                    pass
+            # iid -> (path, is_dir); children load when a directory is opened
+            nodes = {"": (self.vfs.root_directory, True)}
+            loaded = {}
+            generation = {}
+
+            def add_node(parent, name, is_dir):
+                path = os.path.join(nodes[parent][0], name)
+                node = tree.insert(parent, "end", text=name, open=False)
+                nodes[node] = (path, is_dir)
+                if is_dir:
+                    # Placeholder so the expand arrow shows before the listing is read
+                    tree.insert(node, "end", text="Loading...")
+
+            def show_listing(node, listing):
+                if not tree.winfo_exists() or (node and not tree.exists(node)):
+                    return
+                mtime, entries = listing
+                if loaded.get(node) == mtime:
+                    return
+                loaded[node] = mtime
+                generation[node] = generation.get(node, 0) + 1
+                for child in tree.get_children(node):
+                    forget(child)
+                tree.delete(*tree.get_children(node))
+                insert_chunk(node, entries, 0, generation[node])
+
+            def insert_chunk(node, entries, start, gen):
+                # Huge directories go in a slice at a time so the dialog stays responsive
+                if not tree.winfo_exists() or generation.get(node) != gen:
+                    return
+                for name, is_dir in entries[start:start + TREE_CHUNK]:
+                    add_node(node, name, is_dir)
+                if start + TREE_CHUNK < len(entries):
+                    tree.after(1, insert_chunk, node, entries, start + TREE_CHUNK, gen)
+
+            def forget(node):
+                for child in tree.get_children(node):
+                    forget(child)
+                nodes.pop(node, None)
+                loaded.pop(node, None)
+                generation.pop(node, None)
+
+            def show_error(node, error):
+                # Unreadable directories keep their placeholder, relabelled
+                if tree.winfo_exists() and (not node or tree.exists(node)) and node not in loaded:
+                    for child in tree.get_children(node):
+                        tree.item(child, text=f"({error.strerror or error})")
+
+            def load(node):
+                self.run_job("List directory", self.list_directory, nodes[node][0],
+                             on_done=lambda listing: show_listing(node, listing),
+                             on_error=lambda error: show_error(node, error))
+
+            def on_open(event):
+                node = tree.focus()
+                if node in nodes and nodes[node][1]:
+                    load(node)
+
+            def read_preview(file_name):
+                with self.vfs.open_view(file_name) as view:
+                    preview = bytes(view[:500]).decode("utf-8", errors="replace")
+                    truncated = len(view) > 500
+                return preview + ("\n\n...[truncated]" if truncated else "")
 
             def on_node_double_click(event):
                 selected = tree.focus()
-                node_path = get_full_path(tree, selected)
-                if os.path.isfile(node_path):
-                    try:
-                        content = self.vfs.read_file(os.path.relpath(node_path, self.vfs.root_directory))
-                        messagebox.showinfo("File Preview", content[:500] + ("\n\n...[truncated]" if len(content) > 500 else ""))
-                    except Exception as e:
-                        messagebox.showerror("Error", str(e))
-
-            def get_full_path(tree, node):
-                path = []
-                while node:
-                    path.insert(0, tree.item(node)["text"])
-                    node = tree.parent(node)
-                return os.path.join(self.vfs.root_directory, *path)
-
+                if selected not in nodes:
+                    return
+                node_path, is_dir = nodes[selected]
+                if not is_dir:
+                    self.run_job("Preview", read_preview, os.path.relpath(node_path, self.vfs.root_directory),
+                                 on_done=lambda preview: messagebox.showinfo("File Preview", preview))
+
+            tree.bind("<<TreeviewOpen>>", on_open)
             tree.bind("<Double-1>", on_node_double_click)
-            populate_tree("", self.vfs.root_directory)
+            load("")
 
             return frame
 
@@ -940,55 +1110,95 @@ class VFSApp:
             file_listbox = Listbox(frame, selectmode=MULTIPLE, height=12)
             file_listbox.pack(fill=BOTH, expand=True, padx=5, pady=5)
 
-            all_files = [
-                f for f in os.listdir(self.vfs.root_directory)
-                if os.path.isfile(os.path.join(self.vfs.root_directory, f))
-            ]
-            for f in all_files:
-                file_listbox.insert(END, f)
-
             def get_selected_files():
                 return [file_listbox.get(i) for i in file_listbox.curselection()]
 
+            progress_label = ttk.Label(frame, text="")
+            progress_label.pack(pady=2)
+            current = {"job": None}
+
+            def run_batch(title, operations):
+                if current["job"] is not None or not operations:
+                    return
+
+                def work(job):
+                    return self.vfs.batch(
+                        operations,
+                        progress=lambda done, total, operation, error: job.progress(done, total),
+                        cancel_event=job.cancel_event,
+                    )
+
+                def show_progress(done, total, text):
+                    progress_label.config(text=f"{title}: {done}/{total}")
+
+                def finished(report):
+                    current["job"] = None
+                    summary = (f"{title}: {len(report['succeeded'])} done, {len(report['failed'])} failed, "
+                               f"{len(report['cancelled'])} cancelled")
+                    progress_label.config(text=summary)
+                    self.status.config(text=summary)
+                    if report["failed"]:
+                        details = "\n".join(f"{op[1]}: {error}" for op, error in report["failed"][:20])
+                        more = len(report["failed"]) - 20
+                        if more > 0:
+                            details += f"\n... and {more} more"
+                        messagebox.showerror(f"{title} Failed", details)
+                    refresh()
+
+                def failed(e):
+                    current["job"] = None
+                    messagebox.showerror(f"{title} Failed", str(e))
+
+                current["job"] = self.run_job(title, work, with_job=True, on_done=finished,
+                                              on_error=failed, on_progress=show_progress)
+
             def batch_delete():
-                for fname in get_selected_files():
-                    try:
-                        self.vfs.delete_file(fname)
-                    except Exception as e:
-                        messagebox.showerror("Error", str(e))
-                refresh()
+                run_batch("Delete", [("delete_file", fname) for fname in get_selected_files()])
 
             def batch_copy():
                 dest = filedialog.askdirectory(title="Select Destination Folder")
                 if dest:
-                    for fname in get_selected_files():
-                        src = os.path.join(self.vfs.root_directory, fname)
-                        dst = os.path.join(dest, fname)
-                        try:
-                            shutil.copy2(src, dst)
-                        except Exception as e:
-                            messagebox.showerror("Copy Failed", str(e))
+                    run_batch("Copy", [("copy_to", fname, dest) for fname in get_selected_files()])
 
             def batch_move():
                 dest = filedialog.askdirectory(title="Select Destination Folder")
                 if dest:
-                    for fname in get_selected_files():
-                        src = os.path.join(self.vfs.root_directory, fname)
-                        dst = os.path.join(dest, fname)
-                        try:
-                            shutil.move(src, dst)
-                        except Exception as e:
-                            messagebox.showerror("Move Failed", str(e))
-                    refresh()
+                    run_batch("Move", [("move_to", fname, dest) for fname in get_selected_files()])
+
+            def find_duplicates(root_dir):
+                finder = DuplicateFinder(os.path.join(root_dir, ".metadata", "hashes.db"))
+                try:
+                    return finder.find(
+                        (os.path.join(root_dir, name), stats.st_size) for name, stats in self.vfs.scan_files()
+                    )
+                finally:
+                    finder.close()
+
+            def batch_dedupe():
+                root_dir = self.vfs.root_directory
+                self.run_job("Find duplicates", find_duplicates, root_dir,
+                             on_done=lambda groups: confirm_dedupe(root_dir, groups))
+
+            def confirm_dedupe(root_dir, groups):
+                # Keeps the first name of each identical set and moves the rest to trash
+                extras = [os.path.relpath(path, root_dir) for group in groups for path in group["paths"][1:]]
+                if not extras:
+                    messagebox.showinfo("Dedupe", "No duplicate files found.")
+                    return
+                reclaim = sum(group["size"] * (len(group["paths"]) - 1) for group in groups)
+                if not messagebox.askyesno(
+                    "Dedupe", f"Move {len(extras)} duplicate files ({reclaim} bytes) to trash?"
+                ):
+                    return
+                run_batch("Dedupe", [("delete_file", fname) for fname in extras])
 
             def refresh():
-                file_listbox.delete(0, END)
-                current = [
-                    f for f in os.listdir(self.vfs.root_directory)
-                    if os.path.isfile(os.path.join(self.vfs.root_directory, f))
-                ]
-                for f in current:
-                    file_listbox.insert(END, f)
+                def show(names):
+                    file_listbox.delete(0, END)
+                    for f in names:
+                        file_listbox.insert(END, f)
+
+                self.run_job("List files", self.vfs.list_files, on_done=show)
 
             button_frame = ttk.Frame(frame)
             button_frame.pack(pady=5)
@@ -996,7 +1206,11 @@ class VFSApp:
             ttk.Button(button_frame, text="Delete", bootstyle="danger-outline", command=batch_delete).pack(side=LEFT, padx=5)
             ttk.Button(button_frame, text="Copy To...", bootstyle="info-outline", command=batch_copy).pack(side=LEFT, padx=5)
             ttk.Button(button_frame, text="Move To...", bootstyle="warning-outline", command=batch_move).pack(side=LEFT, padx=5)
+            ttk.Button(button_frame, text="Dedupe", bootstyle="secondary-outline", command=batch_dedupe).pack(side=LEFT, padx=5)
+            ttk.Button(button_frame, text="Cancel", bootstyle="secondary-outline",
+                       command=lambda: current["job"] and current["job"].cancel()).pack(side=LEFT, padx=5)
 
+            refresh()
             return frame
 
         self.show_dialog("Batch File Operations", layout)
@@ -1011,49 +1225,56 @@ class VFSApp:
             frame = ttk.Frame(dialog, padding=20)
             frame.pack(fill=BOTH, expand=True)
 
-            stats, filetype_data, date_data = self.collect_file_stats(
-                return_filetypes=True,
-                return_dates=True
-            )
+            loading = ttk.Label(frame, text="Collecting file statistics...", font=("Consolas", 10))
+            loading.pack(pady=10)
+
+            def show(result):
+                if not frame.winfo_exists():
+                    return
+                stats, filetype_data, date_data = result
+                loading.destroy()
+
+                # Text stats (left)
+                text_frame = ttk.Frame(frame)
+                text_frame.pack(side=LEFT, fill=Y, padx=10)
+
+                for key, value in stats.items():
+                    ttk.Label(
+                        text_frame,
+                        text=f"{key}: {value}",
+                        font=("Consolas", 10),
+                        bootstyle="info"
+                    ).pack(anchor="w", pady=2)
+
+                # Charts (right)
+                chart_frame = ttk.Frame(frame)
+                chart_frame.pack(side=RIGHT, fill=BOTH, expand=True)
+
+                fig = Figure(figsize=(6, 4), dpi=100)
+                ax1 = fig.add_subplot(211)  # Pie chart
+                ax2 = fig.add_subplot(212)  # Timeline
+
+                if filetype_data:
+                    labels = list(filetype_data.keys())
+                    sizes = list(filetype_data.values())
+                    ax1.pie(sizes, labels=labels, autopct="%1.1f%%", startangle=140)
+                    ax1.set_title("File Type Distribution", fontsize=10)
+
+                if date_data:
+                    dates = sorted(date_data.keys())
+                    counts = [date_data[d] for d in dates]
+                    ax2.plot(dates, counts, marker="o", linestyle="-", color="steelblue")
+                    ax2.set_title("File Creation Timeline", fontsize=10)
+                    ax2.set_xlabel("Date")
+                    ax2.set_ylabel("Files Created")
+                    fig.autofmt_xdate(rotation=45)
+
+                canvas = FigureCanvasTkAgg(fig, master=chart_frame)
+                canvas.draw()
+                canvas.get_tk_widget().pack(fill=BOTH, expand=True)
 
-            # Text stats (left)
-            text_frame = ttk.Frame(frame)
-            text_frame.pack(side=LEFT, fill=Y, padx=10)
-
-            for key, value in stats.items():
-                ttk.Label(
-                    text_frame,
-                    text=f"{key}: {value}",
-                    font=("Consolas", 10),
-                    bootstyle="info"
-                ).pack(anchor="w", pady=2)
-
-            # Charts (right)
-            chart_frame = ttk.Frame(frame)
-            chart_frame.pack(side=RIGHT, fill=BOTH, expand=True)
-
-            fig = Figure(figsize=(6, 4), dpi=100)
-            ax1 = fig.add_subplot(211)  # Pie chart
-            ax2 = fig.add_subplot(212)  # Timeline
-
-            if filetype_data:
-                labels = list(filetype_data.keys())
-                sizes = list(filetype_data.values())
-                ax1.pie(sizes, labels=labels, autopct="%1.1f%%", startangle=140)
-                ax1.set_title("File Type Distribution", fontsize=10)
-
-            if date_data:
-                dates = sorted(date_data.keys())
-                counts = [date_data[d] for d in dates]
-                ax2.plot(dates, counts, marker="o", linestyle="-", color="steelblue")
-                ax2.set_title("File Creation Timeline", fontsize=10)
-                ax2.set_xlabel("Date")
-                ax2.set_ylabel("Files Created")
-                fig.autofmt_xdate(rotation=45)
-
-            canvas = FigureCanvasTkAgg(fig, master=chart_frame)
-            canvas.draw()
-            canvas.get_tk_widget().pack(fill=BOTH, expand=True)
+            # Scanning a large root takes a while, so it runs as a background job
+            self.run_job("Collect file stats", self.collect_file_stats, True, True, on_done=show)
 
             return frame
 
@@ -1065,10 +1286,7 @@ class VFSApp:
         from collections import defaultdict
         from datetime import datetime
 
-        files = [
-            f for f in os.listdir(self.vfs.root_directory)
-            if os.path.isfile(os.path.join(self.vfs.root_directory, f))
-        ]
+        files = self.vfs.scan_files()
 
         total_files = len(files)
         total_size = 0
@@ -1077,11 +1295,10 @@ class VFSApp:
         extensions = {}
         created_dates = defaultdict(int)
 
-        for f in files:
-            path = os.path.join(self.vfs.root_directory, f)
-            size = os.path.getsize(path)
-            mtime = os.path.getmtime(path)
-            ctime = os.path.getctime(path)
+        for f, stats in files:
+            size = stats.st_size
+            mtime = stats.st_mtime
+            ctime = stats.st_ctime
 
             total_size += size
             if size > largest_file[1]:
@@ -1142,12 +1359,11 @@ class VFSApp:
                 fname = name_entry.get()
                 content = content_box.get("1.0", "end").strip()
                 if fname:
-                    try:
-                        self.vfs.create_file(fname, content)
+                    def done(_):
                         self.status.config(text=f"Created: {fname}")
                         dialog.destroy()
-                    except Exception as e:
-                        messagebox.showerror("Error", str(e))
+
+                    self.run_job(f"Create {fname}", self.vfs.create_file, fname, content, on_done=done)
                 else:
                     messagebox.showerror("Error", "Filename cannot be empty.")
 
@@ -1169,13 +1385,12 @@ class VFSApp:
             def read():
                 fname = name_entry.get()
                 if fname:
-                    try:
-                        content = self.vfs.read_file(fname)
+                    def show(content):
                         result_box.delete("1.0", "end")
                         result_box.insert("1.0", content)
                         self.status.config(text=f"Read: {fname}")
-                    except Exception as e:
-                        messagebox.showerror("Error", str(e))
+
+                    self.run_job(f"Read {fname}", self.vfs.read_file, fname, on_done=show)
 
             ttk.Button(frame, text="Read", command=read, bootstyle="info-outline").pack(pady=5)
             return frame
@@ -1197,12 +1412,11 @@ class VFSApp:
                 fname = name_entry.get()
                 content = content_box.get("1.0", "end").strip()
                 if fname:
-                    try:
-                        self.vfs.update_file(fname, content)
+                    def done(_):
                         self.status.config(text=f"Updated: {fname}")
                         dialog.destroy()
-                    except Exception as e:
-                        messagebox.showerror("Error", str(e))
+
+                    self.run_job(f"Update {fname}", self.vfs.update_file, fname, content, on_done=done)
 
             ttk.Button(frame, text="Update", command=update, bootstyle="warning-outline").pack(pady=10)
             return frame
@@ -1219,12 +1433,11 @@ class VFSApp:
             def delete():
                 fname = name_entry.get()
                 if fname:
-                    try:
-                        self.vfs.delete_file(fname)
+                    def done(_):
                         self.status.config(text=f"Deleted: {fname}")
                         dialog.destroy()
-                    except Exception as e:
-                        messagebox.showerror("Error", str(e))
+
+                    self.run_job(f"Delete {fname}", self.vfs.delete_file, fname, on_done=done)
 
             ttk.Button(frame, text="Delete", command=delete, bootstyle="danger-outline").pack(pady=10)
             return frame
@@ -1243,7 +1456,10 @@ class VFSApp:
 
             def search():
                 fname = name_entry.get()
-                found, meta = self.vfs.search_files(fname)
+                self.run_job(f"Search {fname}", self.vfs.search_files, fname, True,
+                             on_done=lambda result: show(fname, *result))
+
+            def show(fname, found, meta):
                 if found:
                     info = (
                         f"Size: {meta['size']} bytes\n"
@@ -1257,6 +1473,37 @@ class VFSApp:
                     messagebox.showerror("Not Found", f"File '{fname}' not found.")
 
             ttk.Button(frame, text="Search", command=search, bootstyle="primary-outline").pack(pady=5)
+
+            ttk.Label(frame, text="Search Contents:").pack(pady=5)
+            content_entry = ttk.Entry(frame, width=40)
+            content_entry.pack()
+            matches_box = ttk.Text(frame, height=8)
+            matches_box.pack(pady=5)
+            pending = [None]
+
+            def search_contents():
+                pending[0] = None
+                query = content_entry.get()
+
+                def show(matches):
+                    # Drop results for a query the user has since changed
+                    if not dialog.winfo_exists() or content_entry.get() != query:
+                        return
+                    matches_box.delete("1.0", "end")
+                    for match in matches:
+                        matches_box.insert("end", f"{match['file_name']}: {match['snippet']}\n")
+                    if query.strip():
+                        self.status.config(text=f"{len(matches)} files contain: {query}")
+
+                self.run_job("Search contents", self.content_index.search, query, 50, True, on_done=show)
+
+            def on_key(event):
+                # Search once typing pauses instead of on every keystroke
+                if pending[0] is not None:
+                    dialog.after_cancel(pending[0])
+                pending[0] = dialog.after(150, search_contents)
+
+            content_entry.bind("<KeyRelease>", on_key)
             return frame
 
         self.show_dialog("Search File", layout)
@@ -1264,11 +1511,8 @@ class VFSApp:
     def set_shared_directory(self):
         directory = filedialog.askdirectory()
         if directory:
-            try:
-                self.vfs.set_root_directory(directory)
-                self.status.config(text=f"Directory set: {directory}")
-            except Exception as e:
-                messagebox.showerror("Error", str(e))
+            self.run_job("Set directory", self.vfs.set_root_directory, directory,
+                         on_done=lambda _: self.status.config(text=f"Directory set: {directory}"))
 
 if __name__ == "__main__":
     app = ttk.Window(themename="darkly")
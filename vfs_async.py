@@ -0,0 +1,156 @@
+### vfs_async.py
+import asyncio
+import functools
+from contextlib import asynccontextmanager
+from concurrent.futures import ThreadPoolExecutor
+from vfs_core import VFS, CHUNK_SIZE
+
+MAX_WORKERS = 32
+MAX_PENDING = 1024
+PER_FILE_LIMIT = 4
+
+
+class AsyncVFS:
+    # asyncio front-end over VFS. Every call runs on a bounded thread pool;
+    # at most MAX_PENDING calls wait for it at once and at most PER_FILE_LIMIT
+    # of them touch the same file, so one hot file cannot starve the others.
+    def __init__(self, root_directory=None, vfs=None, max_workers=MAX_WORKERS,
+                 max_pending=MAX_PENDING, per_file_limit=PER_FILE_LIMIT, **options):
+        self.vfs = vfs if vfs is not None else VFS(root_directory, **options)
+        self.per_file_limit = per_file_limit
+        self._executor = ThreadPoolExecutor(max_workers, thread_name_prefix="async-vfs")
+        self.max_pending = max_pending
+        # Created inside the running loop on first use; before Python 3.10 a
+        # semaphore binds to whatever loop exists when it is constructed
+        self._pending = None
+        self._loop = None
+        self._files = {}
+
+    @property
+    def root_directory(self):
+        return self.vfs.root_directory
+
+    @asynccontextmanager
+    async def _file_slot(self, file_name):
+        slot = self._files.get(file_name)
+        if slot is None:
+            slot = self._files[file_name] = [asyncio.Semaphore(self.per_file_limit), 0]
+        slot[1] += 1
+        try:
+            async with slot[0]:
+                yield
+        finally:
+            slot[1] -= 1
+            if slot[1] == 0:
+                del self._files[file_name]
+
+    async def _run(self, func, *args, **kwargs):
+        loop = asyncio.get_running_loop()
+        if self._loop is not loop:
+            self._pending = asyncio.Semaphore(self.max_pending)
+            self._loop = loop
+        async with self._pending:
+            return await loop.run_in_executor(self._executor, functools.partial(func, *args, **kwargs))
+
+    async def _run_on(self, file_name, func, *args, **kwargs):
+        async with self._file_slot(file_name):
+            return await self._run(func, *args, **kwargs)
+
+    async def create_file(self, file_name, content=""):
+        return await self._run_on(file_name, self.vfs.create_file, file_name, content)
+
+    async def create_file_stream(self, file_name, chunks):
+        return await self._run_on(file_name, self.vfs.create_file_stream, file_name, self._sync_chunks(chunks))
+
+    async def read_file(self, file_name):
+        return await self._run_on(file_name, self.vfs.read_file, file_name)
+
+    async def read_range(self, file_name, offset, length):
+        return await self._run_on(file_name, self.vfs.read_range, file_name, offset, length)
+
+    async def read_chunks(self, file_name, chunk_size=CHUNK_SIZE):
+        # Async generator; each chunk is read on the pool, so a slow consumer
+        # holds no worker between chunks
+        chunks = await self._run_on(file_name, self.vfs.read_chunks, file_name, chunk_size)
+        try:
+            while True:
+                chunk = await self._run_on(file_name, next, chunks, None)
+                if chunk is None:
+                    break
+                yield chunk
+        finally:
+            await self._run(chunks.close)
+
+    async def update_file(self, file_name, content):
+        return await self._run_on(file_name, self.vfs.update_file, file_name, content)
+
+    async def update_file_stream(self, file_name, chunks):
+        return await self._run_on(file_name, self.vfs.update_file_stream, file_name, self._sync_chunks(chunks))
+
+    async def delete_file(self, file_name):
+        return await self._run_on(file_name, self.vfs.delete_file, file_name)
+
+    async def stat(self, file_name):
+        return await self._run_on(file_name, self.vfs.stat, file_name)
+
+    async def search_files(self, file_name, include_content=False):
+        return await self._run_on(file_name, self.vfs.search_files, file_name, include_content)
+
+    async def list_files(self):
+        return await self._run(self.vfs.list_files)
+
+    async def scan_files(self):
+        return await self._run(self.vfs.scan_files)
+
+    async def set_root_directory(self, directory_path):
+        return await self._run(self.vfs.set_root_directory, directory_path)
+
+    async def get_file_versions(self, file_name, offset=0, limit=None):
+        return await self._run(self.vfs.get_file_versions, file_name, offset, limit)
+
+    async def read_version(self, version_path):
+        return await self._run(self.vfs.read_version, version_path)
+
+    async def restore_version(self, version_path):
+        return await self._run(self.vfs.restore_version, version_path)
+
+    async def version_metrics(self):
+        return await self._run(self.vfs.version_metrics)
+
+    async def list_trashed_files(self, offset=0, limit=None):
+        return await self._run(self.vfs.list_trashed_files, offset, limit)
+
+    async def restore_file(self, trash_id):
+        return await self._run(self.vfs.restore_file, trash_id)
+
+    async def permanently_delete_file(self, trash_id):
+        return await self._run(self.vfs.permanently_delete_file, trash_id)
+
+    async def purge_trash(self, max_age=None, max_bytes=None, limit=100):
+        return await self._run(self.vfs.purge_trash, max_age, max_bytes, limit)
+
+    def _sync_chunks(self, chunks):
+        # Lets the worker thread pull from an async iterable on the event loop
+        if not hasattr(chunks, "__aiter__"):
+            return chunks
+        loop = asyncio.get_running_loop()
+        iterator = chunks.__aiter__()
+
+        def pull():
+            while True:
+                try:
+                    yield asyncio.run_coroutine_threadsafe(iterator.__anext__(), loop).result()
+                except StopAsyncIteration:
+                    return
+
+        return pull()
+
+    async def close(self):
+        await self._run(self.vfs.close)
+        self._executor.shutdown(wait=True)
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        await self.close()
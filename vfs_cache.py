@@ -0,0 +1,162 @@
+### vfs_cache.py
+import os
+import time
+import threading
+from collections import OrderedDict
+
+CACHE_BYTES = 64 * 1024 * 1024
+
+
+class ContentCache:
+    # Byte-bounded LRU of file contents. Each entry remembers the identity
+    # (inode, size, mtime) it was read under, so a changed file is a miss.
+    def __init__(self, max_bytes=CACHE_BYTES):
+        self.max_bytes = max_bytes
+        self.current_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()
+
+    def get(self, key, identity):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry[0] != identity:
+                if entry is not None:
+                    self._drop(key)
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[2]
+
+    def put(self, key, identity, size, value):
+        if size > self.max_bytes:
+            return
+        with self._lock:
+            if key in self._entries:
+                self._drop(key)
+            self._entries[key] = (identity, size, value)
+            self.current_bytes += size
+            while self.current_bytes > self.max_bytes:
+                oldest = next(iter(self._entries))
+                self._drop(oldest)
+                self.evictions += 1
+
+    def _drop(self, key):
+        _, size, _ = self._entries.pop(key)
+        self.current_bytes -= size
+
+    def invalidate(self, key):
+        with self._lock:
+            if key in self._entries:
+                self._drop(key)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.current_bytes = 0
+
+    def stats(self):
+        with self._lock:
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "entries": len(self._entries),
+                "bytes": self.current_bytes,
+                "max_bytes": self.max_bytes,
+            }
+
+
+STAT_TTL = 2.0
+STAT_MAX_ENTRIES = 100000
+
+
+class StatCache:
+    # Short-lived cache of stat results, including "does not exist" answers.
+    # Entries expire after `ttl` seconds and are dropped on any VFS mutation;
+    # scandir() fills it with one stat per entry of a directory listing.
+    def __init__(self, ttl=STAT_TTL, max_entries=STAT_MAX_ENTRIES):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._stats = {}
+        self._listings = {}
+        # Bumped by every invalidation, so a stat racing a mutation is not cached
+        self._generation = 0
+
+    def _prune(self, now):
+        if len(self._stats) > self.max_entries:
+            self._stats = {path: entry for path, entry in self._stats.items() if entry[0] > now}
+            self._listings = {path: entry for path, entry in self._listings.items() if entry[0] > now}
+
+    def stat(self, path):
+        now = time.monotonic()
+        with self._lock:
+            entry = self._stats.get(path)
+            if entry is not None and entry[0] > now:
+                self.hits += 1
+                return entry[1]
+            self.misses += 1
+            generation = self._generation
+        try:
+            result = os.stat(path)
+        except (FileNotFoundError, NotADirectoryError):
+            result = None
+        with self._lock:
+            if generation == self._generation:
+                self._stats[path] = (now + self.ttl, result)
+                self._prune(now)
+        return result
+
+    def scandir(self, directory):
+        now = time.monotonic()
+        with self._lock:
+            listing = self._listings.get(directory)
+            if listing is not None and listing[0] > now:
+                self.hits += 1
+                return listing[1]
+            self.misses += 1
+            generation = self._generation
+        entries = []
+        with os.scandir(directory) as it:
+            for entry in it:
+                try:
+                    entries.append((entry.name, entry.stat()))
+                except FileNotFoundError:
+                    continue
+        with self._lock:
+            if generation == self._generation:
+                expires = now + self.ttl
+                self._listings[directory] = (expires, entries)
+                for name, result in entries:
+                    self._stats[os.path.join(directory, name)] = (expires, result)
+                self._prune(now)
+        return entries
+
+    def invalidate(self, path):
+        with self._lock:
+            self._generation += 1
+            self._stats.pop(path, None)
+            self._listings.pop(path, None)
+            self._listings.pop(os.path.dirname(path), None)
+
+    def clear(self):
+        with self._lock:
+            self._generation += 1
+            self._stats.clear()
+            self._listings.clear()
+
+    def stats(self):
+        with self._lock:
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "entries": len(self._stats),
+                "listings": len(self._listings),
+                "ttl": self.ttl,
+            }
@@ -0,0 +1,157 @@
+### vfs_columns.py
+import os
+import time
+from array import array
+
+
+class FileMeta:
+    # One file's metadata. Behaves like the dict entries the cache used to
+    # hold; the ctime strings are only formatted when somebody asks for them.
+    __slots__ = ("size", "ctime", "mtime")
+
+    KEYS = ("size", "ctime", "mtime", "creation_time", "modification_time")
+
+    def __init__(self, size, ctime, mtime):
+        self.size = size
+        self.ctime = ctime
+        self.mtime = mtime
+
+    def __getitem__(self, key):
+        if key == "creation_time":
+            return time.ctime(self.ctime)
+        if key == "modification_time":
+            return time.ctime(self.mtime)
+        if key in ("size", "ctime", "mtime"):
+            return getattr(self, key)
+        raise KeyError(key)
+
+    def __contains__(self, key):
+        return key in self.KEYS
+
+    def get(self, key, default=None):
+        try:
+            return self[key]
+        except KeyError:
+            return default
+
+    def __eq__(self, other):
+        return isinstance(other, FileMeta) and (self.size, self.ctime, self.mtime) == (other.size, other.ctime, other.mtime)
+
+    def __repr__(self):
+        return f"FileMeta(size={self.size}, ctime={self.ctime}, mtime={self.mtime})"
+
+
+class MetadataStore:
+    # Path -> FileMeta mapping stored as columns. Directory paths are interned
+    # once; each directory maps basenames to a row in the size/ctime/mtime
+    # arrays, and rows freed by removals are reused.
+    def __init__(self, rows=()):
+        self._dirs = []
+        self._dir_ids = {}
+        self._files = []
+        self._sizes = array("q")
+        self._ctimes = array("d")
+        self._mtimes = array("d")
+        self._free = []
+        self._count = 0
+        for path, size, ctime, mtime in rows:
+            self.put(path, size, ctime, mtime)
+
+    def _locate(self, path):
+        directory, name = os.path.split(path)
+        dir_id = self._dir_ids.get(directory)
+        if dir_id is None:
+            return None, name, None
+        return dir_id, name, self._files[dir_id].get(name)
+
+    def put(self, path, size, ctime, mtime):
+        directory, name = os.path.split(path)
+        dir_id = self._dir_ids.get(directory)
+        if dir_id is None:
+            dir_id = self._dir_ids[directory] = len(self._dirs)
+            self._dirs.append(directory)
+            self._files.append({})
+        files = self._files[dir_id]
+        row = files.get(name)
+        if row is None:
+            if self._free:
+                row = self._free.pop()
+            else:
+                row = len(self._sizes)
+                self._sizes.append(0)
+                self._ctimes.append(0.0)
+                self._mtimes.append(0.0)
+            files[name] = row
+            self._count += 1
+        self._sizes[row] = size
+        self._ctimes[row] = ctime
+        self._mtimes[row] = mtime
+
+    def _meta(self, row):
+        return FileMeta(self._sizes[row], self._ctimes[row], self._mtimes[row])
+
+    def get(self, path, default=None):
+        _, _, row = self._locate(path)
+        return default if row is None else self._meta(row)
+
+    def __getitem__(self, path):
+        meta = self.get(path)
+        if meta is None:
+            raise KeyError(path)
+        return meta
+
+    def __setitem__(self, path, meta):
+        self.put(path, meta.size, meta.ctime, meta.mtime)
+
+    def __contains__(self, path):
+        return self._locate(path)[2] is not None
+
+    def pop(self, path, default=None):
+        dir_id, name, row = self._locate(path)
+        if row is None:
+            return default
+        meta = self._meta(row)
+        del self._files[dir_id][name]
+        self._free.append(row)
+        self._count -= 1
+        return meta
+
+    def __len__(self):
+        return self._count
+
+    def __bool__(self):
+        return self._count > 0
+
+    def __iter__(self):
+        for directory, files in zip(self._dirs, list(self._files)):
+            for name in list(files):
+                yield os.path.join(directory, name)
+
+    def keys(self):
+        return iter(self)
+
+    def items(self):
+        for directory, files in zip(self._dirs, list(self._files)):
+            for name, row in list(files.items()):
+                yield os.path.join(directory, name), self._meta(row)
+
+    def column(self, field):
+        # (value, path) for every file, read straight from one column
+        values = {"size": self._sizes, "ctime": self._ctimes, "mtime": self._mtimes}[field]
+        for directory, files in zip(self._dirs, list(self._files)):
+            for name, row in list(files.items()):
+                yield values[row], os.path.join(directory, name)
+
+    def paths_under(self, directory):
+        # Every file below directory, found through the interned directory list
+        prefix = directory + os.sep
+        for dir_id, path in enumerate(self._dirs):
+            if path == directory or path.startswith(prefix):
+                for name in list(self._files[dir_id]):
+                    yield os.path.join(path, name)
+
+    def paths_in(self, directory):
+        dir_id = self._dir_ids.get(directory)
+        if dir_id is None:
+            return []
+        return [os.path.join(directory, name) for name in self._files[dir_id]]
@@ -0,0 +1,136 @@
+### vfs_copy.py
+import os
+import sys
+import errno
+import shutil
+import threading
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
+# ioctl(dest, FICLONE, src) shares the source's extents (btrfs, XFS, overlayfs...)
+FICLONE = 0x40049409
+BUFFER_SIZE = 1024 * 1024
+# Windows opens descriptors in text mode unless told otherwise
+O_BINARY = getattr(os, "O_BINARY", 0)
+STRATEGIES = ("reflink", "copy_file_range", "sendfile", "buffered")
+
+# Errors that mean "this strategy does not work here", not "the copy failed"
+UNSUPPORTED = {errno.EXDEV, errno.EINVAL, errno.ENOSYS, errno.EOPNOTSUPP, errno.ENOTTY,
+               errno.EBADF, errno.ETXTBSY, errno.EPERM, errno.ENOTSOCK}
+
+# (source device, destination device) pairs a strategy already failed on
+_unsupported = set()
+_unsupported_lock = threading.Lock()
+
+
+def _reflink(src_fd, dst_fd, size):
+    if fcntl is None:
+        raise OSError(errno.ENOSYS, "reflink is not available on this platform")
+    fcntl.ioctl(dst_fd, FICLONE, src_fd)
+
+
+def _copy_file_range(src_fd, dst_fd, size):
+    if not hasattr(os, "copy_file_range"):
+        raise OSError(errno.ENOSYS, "copy_file_range is not available")
+    copied = 0
+    while copied < size:
+        sent = os.copy_file_range(src_fd, dst_fd, size - copied)
+        if sent == 0:
+            break
+        copied += sent
+
+
+def _sendfile(src_fd, dst_fd, size):
+    # Only Linux sends to regular files; macOS and the BSDs want a socket
+    if not sys.platform.startswith("linux") or not hasattr(os, "sendfile"):
+        raise OSError(errno.ENOSYS, "sendfile to a file is not available")
+    copied = 0
+    while copied < size:
+        sent = os.sendfile(dst_fd, src_fd, copied, min(size - copied, 1 << 30))
+        if sent == 0:
+            break
+        copied += sent
+
+
+def _buffered(src_fd, dst_fd, size):
+    buffer = bytearray(BUFFER_SIZE)
+    view = memoryview(buffer)
+    while True:
+        if hasattr(os, "readv"):
+            read = os.readv(src_fd, [buffer])
+            data = view[:read]
+        else:
+            data = os.read(src_fd, BUFFER_SIZE)
+            read = len(data)
+        if not read:
+            break
+        written = 0
+        while written < read:
+            written += os.write(dst_fd, data[written:])
+
+
+COPIERS = {
+    "reflink": _reflink,
+    "copy_file_range": _copy_file_range,
+    "sendfile": _sendfile,
+    "buffered": _buffered,
+}
+
+
+def copy_fds(src_fd, dst_fd, strategies=STRATEGIES):
+    # Tries each strategy in turn and returns the name of the one that worked.
+    # A strategy that fails part-way leaves nothing behind for the next one.
+    src_stats = os.fstat(src_fd)
+    devices = (src_stats.st_dev, os.fstat(dst_fd).st_dev)
+    for strategy in strategies:
+        if strategy != "buffered" and (strategy, devices) in _unsupported:
+            continue
+        try:
+            COPIERS[strategy](src_fd, dst_fd, src_stats.st_size)
+            return strategy
+        except OSError as e:
+            if strategy == "buffered" or e.errno not in UNSUPPORTED:
+                raise
+            with _unsupported_lock:
+                _unsupported.add((strategy, devices))
+            os.lseek(src_fd, 0, os.SEEK_SET)
+            os.lseek(dst_fd, 0, os.SEEK_SET)
+            os.ftruncate(dst_fd, 0)
+    raise OSError(errno.ENOSYS, "No copy strategy was usable.")
+
+
+def copy_file(src, dst, strategies=STRATEGIES, keep_metadata=True):
+    # Copies src to dst through a temporary file renamed into place, so dst is
+    # either the old file or the complete copy. Returns the strategy used.
+    tmp_path = f"{dst}.{os.getpid()}.{threading.get_ident()}.tmp"
+    src_fd = os.open(src, os.O_RDONLY | O_BINARY)
+    try:
+        dst_fd = os.open(tmp_path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC | O_BINARY, 0o666)
+        try:
+            strategy = copy_fds(src_fd, dst_fd, strategies)
+        finally:
+            os.close(dst_fd)
+        if keep_metadata:
+            shutil.copystat(src, tmp_path)
+        os.replace(tmp_path, dst)
+        return strategy
+    finally:
+        os.close(src_fd)
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+
+
+def move_file(src, dst):
+    # A rename when both sides share a filesystem, otherwise copy then unlink
+    try:
+        os.replace(src, dst)
+        return "rename"
+    except OSError as e:
+        if e.errno != errno.EXDEV:
+            raise
+    strategy = copy_file(src, dst)
+    os.remove(src)
+    return strategy
@@ -1,112 +1,447 @@
 ### vfs_core.py
 import os
+import stat
+import errno
 import time
-import shutil
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+from vfs_versions import VersionStore, KEYFRAME_INTERVAL
+from vfs_trash import TrashStore, TrashPurger
+from vfs_mmap import MmapCache
+from vfs_journal import Journal
+from vfs_cache import ContentCache, StatCache, CACHE_BYTES, STAT_TTL
+from vfs_locks import LockTable, LOCK_SHARDS
+from vfs_copy import copy_file, move_file
+
+CHUNK_SIZE = 1024 * 1024
+BATCH_WORKERS = 8
+BATCH_OPERATIONS = {"create_file", "update_file", "delete_file", "copy_to", "move_to",
+                    "restore_file", "permanently_delete_file"}
 
 class VFS:
-    def __init__(self, root_directory=None):
+    def __init__(self, root_directory=None, keyframe_interval=KEYFRAME_INTERVAL,
+                 trash_max_age=None, trash_max_bytes=None, cache_bytes=CACHE_BYTES,
+                 stat_ttl=STAT_TTL, lock_shards=LOCK_SHARDS):
         self.root_directory = root_directory or os.getcwd()
+        self.keyframe_interval = keyframe_interval
+        self.trash_max_age = trash_max_age
+        self.trash_max_bytes = trash_max_bytes
+        self.purger = None
+        self.journal = None
+        self.mmaps = MmapCache()
+        self.content_cache = ContentCache(cache_bytes)
+        self.stat_cache = StatCache(stat_ttl)
+        # Per-file reader/writer locks: readers of a file share it, writers
+        # to it take turns, and different files never wait on each other
+        self.locks = LockTable(lock_shards)
+        self._listeners = []
+        self._open_stores()
+
+    def _open_stores(self):
+        self.versions = VersionStore(
+            os.path.join(self.root_directory, ".versions"),
+            keyframe_interval=self.keyframe_interval,
+        )
+        self.trash = TrashStore(os.path.join(self.root_directory, ".trash"))
+        self._start_purger()
+        if self.journal is not None:
+            self.journal.close()
+        # Finish whatever a crashed process left half-done before taking new writes
+        self.journal = Journal(os.path.join(self.root_directory, ".journal"))
+        self.journal.recover(self._replay)
+
+    def _start_purger(self):
+        if self.purger is not None:
+            self.purger.stop()
+            self.purger = None
+        # Retention limits are enforced in the background, a batch at a time
+        if self.trash_max_age is not None or self.trash_max_bytes is not None:
+            self.purger = TrashPurger(self.trash, self.trash_max_age, self.trash_max_bytes)
+            self.purger.start()
+
+    def set_trash_limits(self, max_age=None, max_bytes=None):
+        # None lifts a limit; with neither set the trash is only emptied by hand
+        self.trash_max_age = max_age
+        self.trash_max_bytes = max_bytes
+        self._start_purger()
+
+    def close(self):
+        if self.purger is not None:
+            self.purger.stop()
+            self.purger = None
+        self.journal.close()
+        self.mmaps.close()
+
+    def add_listener(self, callback):
+        # callback(event, file_name) runs after each completed mutation, with event
+        # one of "created", "updated", "deleted", "restored", or "root" (file_name
+        # None) when the root directory changes
+        self._listeners.append(callback)
+
+    def remove_listener(self, callback):
+        if callback in self._listeners:
+            self._listeners.remove(callback)
+
+    def _notify(self, event, file_name):
+        for callback in list(self._listeners):
+            try:
+                callback(event, file_name)
+            except Exception as e:
+                logging.error(f"Listener failed on {event} for {file_name}: {e}")
+
+    def _identity(self, file_path):
+        try:
+            stats = os.stat(file_path)
+        except FileNotFoundError:
+            return None
+        return [stats.st_ino, stats.st_size, stats.st_mtime_ns]
+
+    def _replay(self, record):
+        file_name, file_path = self.resolve_path(record["name"])
+        if "before" in record and self._identity(file_path) != record["before"]:
+            # The target changed after the intent was logged: either the operation
+            # completed, or something newer replaced the file. Either way, leave it.
+            return []
+        if record["op"] == "delete":
+            if os.path.exists(file_path):
+                self.trash.trash(file_name, file_path)
+            return [file_path]
+        staged_path = self.journal.staged_path(record)
+        if staged_path is not None and not os.path.exists(staged_path):
+            # The staged file was already renamed into place
+            return []
+        if record["op"] == "update" and os.path.exists(file_path):
+            data = self.journal.payload_data(record)
+            if data is not None:
+                with open(file_path, "rb") as file:
+                    if file.read() == data:
+                        return []
+            with self.versions.file_lock(file_name):
+                self.versions.snapshot(file_name, file_path)
+                self._apply_payload(file_path, record)
+        else:
+            self._apply_payload(file_path, record)
+        return [file_path]
+
+    def _apply_payload(self, file_path, payload):
+        staged_path = self.journal.staged_path(payload)
+        if staged_path is None:
+            self._write_chunks(file_path, [self.journal.payload_data(payload)])
+            return
+        self._keep_mode(file_path, staged_path)
+        self._invalidate(file_path)
+        try:
+            os.replace(staged_path, file_path)
+        except OSError as e:
+            if e.errno != errno.EXDEV:
+                raise
+            # The journal lives on another filesystem than this file
+            copy_file(staged_path, file_path)
+            os.remove(staged_path)
+
+    def _invalidate(self, file_path):
+        self.mmaps.invalidate(file_path)
+        self.content_cache.invalidate(file_path)
+        self.stat_cache.invalidate(file_path)
+
+    def resolve_path(self, file_name):
+        # Every name a caller passes is relative to the root; absolute names and
+        # names that climb out of it with ".." are refused. Returns the normalized
+        # name, which keys versions, trash, the journal and listeners, and the path.
+        normalized = os.path.normpath(file_name) if isinstance(file_name, str) and file_name else ""
+        if (not normalized or normalized == "." or os.path.isabs(normalized) or os.path.splitdrive(normalized)[0]
+                or normalized == os.pardir or normalized.startswith(os.pardir + os.sep)):
+            raise ValueError(f"Invalid file name '{file_name}'.")
+        return normalized, os.path.join(self.root_directory, normalized)
+
+    def _version_name(self, version_path):
+        versions_dir = os.path.join(self.root_directory, ".versions")
+        version_name = os.path.relpath(os.path.join(versions_dir, version_path), versions_dir)
+        if version_name == os.pardir or version_name.startswith(os.pardir + os.sep):
+            raise ValueError(f"Invalid version '{version_path}'.")
+        return version_name
+
+    def cache_stats(self):
+        return {"content": self.content_cache.stats(), "stat": self.stat_cache.stats()}
+
+    def stat(self, file_name):
+        file_name, file_path = self.resolve_path(file_name)
+        stats = self.stat_cache.stat(file_path)
+        if stats is None:
+            raise FileNotFoundError(f"File '{file_name}' does not exist.")
+        return stats
+
+    def scan_files(self):
+        # One scandir pass yields every regular file with its stat result
+        return [
+            (name, stats)
+            for name, stats in self.stat_cache.scandir(self.root_directory)
+            if stat.S_ISREG(stats.st_mode)
+        ]
 
     def create_file(self, file_name, content=""):
-        file_path = os.path.join(self.root_directory, file_name)
-        with open(file_path, "w") as file:
-            file.write(content)
+        self.create_file_stream(file_name, [content])
+
+    def create_file_stream(self, file_name, chunks):
+        file_name, file_path = self.resolve_path(file_name)
+        payload = self.journal.stage(chunks)
+        with self.locks.write(os.path.normpath(file_path)):
+            txid = self.journal.log("create", file_name, payload, self._identity(file_path))
+            try:
+                self._apply_payload(file_path, payload)
+            except BaseException:
+                self._abort(txid, payload)
+                raise
+            self._invalidate(file_path)
+            self.journal.done(txid, file_path)
+        self._notify("created", file_name)
+
+    def _abort(self, txid, payload=None):
+        self.journal.done(txid)
+        if payload is not None:
+            self.journal.discard(payload)
+
+    def _keep_mode(self, file_path, new_path):
+        try:
+            mode = os.stat(file_path).st_mode
+        except FileNotFoundError:
+            return
+        os.chmod(new_path, stat.S_IMODE(mode))
+
+    def _write_chunks(self, file_path, chunks):
+        # Write beside the target and rename over it, so readers holding a
+        # mapping of the old file never see it truncated underneath them
+        tmp_path = f"{file_path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        try:
+            with open(tmp_path, "wb") as file:
+                for chunk in chunks:
+                    file.write(chunk.encode("utf-8") if isinstance(chunk, str) else chunk)
+            self._keep_mode(file_path, tmp_path)
+            self._invalidate(file_path)
+            os.replace(tmp_path, file_path)
+        finally:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
 
     def read_file(self, file_name):
-        file_path = os.path.join(self.root_directory, file_name)
-        if os.path.exists(file_path):
-            with open(file_path, "r") as file:
-                return file.read()
-        raise FileNotFoundError(f"File '{file_name}' does not exist.")
+        file_name, file_path = self.resolve_path(file_name)
+        with self.locks.read(os.path.normpath(file_path)):
+            stats = self.stat(file_name)
+            # Hot files are served from memory until they change on disk
+            identity = (stats.st_ino, stats.st_size, stats.st_mtime_ns)
+            content = self.content_cache.get(file_path, identity)
+            if content is None:
+                with open(file_path, "r", encoding="utf-8") as file:
+                    content = file.read()
+                self.content_cache.put(file_path, identity, stats.st_size, content)
+        return content
 
-    def update_file(self, file_name, content):
-        file_path = os.path.join(self.root_directory, file_name)
-        if not os.path.exists(file_path):
+    def read_chunks(self, file_name, chunk_size=CHUNK_SIZE):
+        file_name, file_path = self.resolve_path(file_name)
+        # Opened under the read lock; writers replace the file by rename, so the
+        # open handle keeps reading one consistent version afterwards
+        with self.locks.read(os.path.normpath(file_path)):
+            self.stat(file_name)
+            file = open(file_path, "rb")
+        return self._iter_file(file, chunk_size)
+
+    def _iter_file(self, file, chunk_size):
+        with file:
+            while True:
+                data = file.read(chunk_size)
+                if not data:
+                    break
+                yield data
+
+    def read_range(self, file_name, offset, length):
+        if offset < 0 or length < 0:
+            raise ValueError("Offset and length must not be negative.")
+        file_name, file_path = self.resolve_path(file_name)
+        with self.locks.read(os.path.normpath(file_path)):
+            self.stat(file_name)
+            with open(file_path, "rb") as file:
+                file.seek(offset)
+                return file.read(length)
+
+    def open_view(self, file_name):
+        file_name, file_path = self.resolve_path(file_name)
+        if not stat.S_ISREG(self.stat(file_name).st_mode):
             raise FileNotFoundError(f"File '{file_name}' does not exist.")
-        # Ensure .versions directory exists
-        versions_dir = os.path.join(self.root_directory, ".versions")
-        os.makedirs(versions_dir, exist_ok=True)
-        # Generate version file name
-        base, ext = os.path.splitext(file_name)
-        timestamp = time.strftime("%Y%m%d%H%M%S")
-        version_filename = f"{base}_v{timestamp}{ext}"
-        version_path = os.path.join(versions_dir, version_filename)
-        # Copy current version to .versions before overwriting
-        shutil.copy(file_path, version_path)
-        # Overwrite the file with new content
-        with open(file_path, "w") as file:
-            file.write(content)
+        return self.mmaps.view(file_path)
+
+    def update_file(self, file_name, content):
+        self.update_file_stream(file_name, [content])
+
+    def update_file_stream(self, file_name, chunks):
+        file_name, file_path = self.resolve_path(file_name)
+        self.stat(file_name)
+        payload = self.journal.stage(chunks)
+        with self.locks.write(os.path.normpath(file_path)):
+            txid = self.journal.log("update", file_name, payload, self._identity(file_path))
+            try:
+                # Snapshot the current version and overwrite it as one step, so that
+                # concurrent updaters each version the content they replace; other
+                # files' updates go ahead meanwhile
+                with self.versions.file_lock(file_name):
+                    self.versions.snapshot(file_name, file_path)
+                    self._apply_payload(file_path, payload)
+            except BaseException:
+                self._abort(txid, payload)
+                raise
+            self._invalidate(file_path)
+            self.journal.done(txid, file_path)
+        self._notify("updated", file_name)
 
     def delete_file(self, file_name):
-        file_path = os.path.join(self.root_directory, file_name)
-        if os.path.exists(file_path):
-            trash_dir = os.path.join(self.root_directory, ".trash")
-            os.makedirs(trash_dir, exist_ok=True)
+        file_name, file_path = self.resolve_path(file_name)
+        with self.locks.write(os.path.normpath(file_path)):
+            if self.stat_cache.stat(file_path) is None:
+                raise FileNotFoundError(f"File '{file_name}' does not exist.")
+            txid = self.journal.log("delete", file_name, before=self._identity(file_path))
+            try:
+                self._invalidate(file_path)
+                self.trash.trash(file_name, file_path)
+            except BaseException:
+                self._abort(txid)
+                raise
+            self._invalidate(file_path)
+            self.journal.done(txid, file_path)
+        self._notify("deleted", file_name)
 
-            trashed_name = f"{file_name}__{int(time.time())}"
-            trash_path = os.path.join(trash_dir, trashed_name)
 
-            shutil.move(file_path, trash_path)
-        else:
-            raise FileNotFoundError(f"File '{file_name}' does not exist.")
+    def search_files(self, file_name, include_content=False):
+        file_name, file_path = self.resolve_path(file_name)
+        stats = self.stat_cache.stat(file_path)
+        if stats is None:
+            return False, {}
+        metadata = {
+            "size": stats.st_size,
+            "creation_time": time.ctime(stats.st_ctime),
+        }
+        if include_content:
+            with self.locks.read(os.path.normpath(file_path)):
+                with open(file_path, "r", encoding="utf-8") as file:
+                    metadata["content"] = file.read()
+        return True, metadata
+
+    def copy_to(self, file_name, dest_directory):
+        file_name, file_path = self.resolve_path(file_name)
+        with self.locks.read(os.path.normpath(file_path)):
+            self.stat(file_name)
+            dest = os.path.join(dest_directory, os.path.basename(file_name))
+            copy_file(file_path, dest)
+            return dest
 
+    def move_to(self, file_name, dest_directory):
+        file_name, file_path = self.resolve_path(file_name)
+        with self.locks.write(os.path.normpath(file_path)):
+            self.stat(file_name)
+            self._invalidate(file_path)
+            dest = os.path.join(dest_directory, os.path.basename(file_name))
+            move_file(file_path, dest)
+            self._invalidate(file_path)
+        # The file has left this root
+        self._notify("deleted", file_name)
+        return dest
 
-    def search_files(self, file_name):
-        file_path = os.path.join(self.root_directory, file_name)
-        if os.path.exists(file_path):
-            with open(file_path, "r") as file:
-                content = file.read()
-            metadata = {
-                "size": os.path.getsize(file_path),
-                "creation_time": time.ctime(os.path.getctime(file_path)),
-                "content": content,
-            }
-            return True, metadata
-        return False, {}
+    def batch(self, operations, workers=BATCH_WORKERS, progress=None, cancel_event=None):
+        # Runs (op, file_name, *args) tuples on a pool of at most `workers`
+        # threads, op being a VFS method such as "delete_file" or "copy_to".
+        # progress(done, total, operation, error) is called from the workers after
+        # each one; once cancel_event is set, operations not yet started are
+        # skipped. Returns one report for the whole batch.
+        operations = list(operations)
+        for operation in operations:
+            if operation[0] not in BATCH_OPERATIONS:
+                raise ValueError(f"Unsupported batch operation '{operation[0]}'.")
+        report = {"total": len(operations), "succeeded": [], "failed": [], "cancelled": []}
+        lock = threading.Lock()
+
+        def run(operation):
+            if cancel_event is not None and cancel_event.is_set():
+                with lock:
+                    report["cancelled"].append(operation)
+                return
+            error = None
+            try:
+                getattr(self, operation[0])(*operation[1:])
+            except Exception as e:
+                error = e
+            with lock:
+                if error is None:
+                    report["succeeded"].append(operation)
+                else:
+                    report["failed"].append((operation, f"{type(error).__name__}: {error}"))
+                done = len(report["succeeded"]) + len(report["failed"])
+            if progress is not None:
+                progress(done, len(operations), operation, error)
+
+        # Submit only a few operations ahead of the pool, so huge batches stay cheap
+        with ThreadPoolExecutor(max(1, workers), thread_name_prefix="vfs-batch") as executor:
+            running = set()
+            for operation in operations:
+                if len(running) >= 2 * workers:
+                    _, running = wait(running, return_when=FIRST_COMPLETED)
+                running.add(executor.submit(run, operation))
+        return report
 
     def set_root_directory(self, directory_path):
         if os.path.exists(directory_path):
             self.root_directory = directory_path
+            self._open_stores()
+            self._notify("root", None)
         else:
             raise ValueError(f"Provided directory '{directory_path}' does not exist.")
 
     def list_files(self):
-        return [f for f in os.listdir(self.root_directory) if os.path.isfile(os.path.join(self.root_directory, f))]
+        return [name for name, _ in self.scan_files()]
 
-    def get_file_versions(self, file_name):
+    def get_file_versions(self, file_name, offset=0, limit=None):
+        file_name, _ = self.resolve_path(file_name)
         versions_dir = os.path.join(self.root_directory, ".versions")
         if not os.path.exists(versions_dir):
             return []
-        base_name, ext = os.path.splitext(file_name)
-        version_files = []
-        for fname in os.listdir(versions_dir):
-            if fname.startswith(base_name + "_v") and fname.endswith(ext):
-                version_files.append(os.path.join(versions_dir, fname))
-        return sorted(version_files)
+        return [
+            os.path.join(versions_dir, row["version_id"])
+            for row in self.versions.list_versions(file_name, offset, limit)
+        ]
+
+    def read_version(self, version_path):
+        version_name = self._version_name(version_path)
+        return self.versions.read_version(version_name).decode("utf-8")
+
+    def restore_version(self, version_path):
+        version_name = self._version_name(version_path)
+        info = self.versions.version_info(version_name)
+        if info is None:
+            raise FileNotFoundError(f"Version '{version_name}' does not exist.")
+        self.update_file_stream(info["file_name"], [self.versions.read_version(version_name)])
+        return info["file_name"]
+
+    def version_metrics(self):
+        return self.versions.get_metrics()
     
-    def list_trashed_files(self):
+    def list_trashed_files(self, offset=0, limit=None):
         trash_dir = os.path.join(self.root_directory, ".trash")
         if not os.path.exists(trash_dir):
             return []
-        return os.listdir(trash_dir)
-    
-    def restore_file(self, trashed_name):
-        trash_dir = os.path.join(self.root_directory, ".trash")
-        source = os.path.join(trash_dir, trashed_name)
+        return self.trash.list_entries(offset, limit)
 
-        if not os.path.exists(source):
+    def restore_file(self, trash_id):
+        entry = self.trash.get_entry(trash_id)
+        if entry is None:
             raise FileNotFoundError("Trashed file not found.")
+        file_name, file_path = self.resolve_path(entry["original_name"])
+        with self.locks.write(os.path.normpath(file_path)):
+            self._invalidate(file_path)
+            self.trash.restore(trash_id, self.root_directory)
+            self._invalidate(file_path)
+        self._notify("restored", file_name)
+        return file_name
 
-        original_name = trashed_name.split("__")[0]
-        dest = os.path.join(self.root_directory, original_name)
-
-        shutil.move(source, dest)
-
-    def permanently_delete_file(self, trashed_name):
-        trash_dir = os.path.join(self.root_directory, ".trash")
-        target = os.path.join(trash_dir, trashed_name)
-        if os.path.exists(target):
-            os.remove(target)
-
-
+    def permanently_delete_file(self, trash_id):
+        self.trash.remove(trash_id)
 
+    def purge_trash(self, max_age=None, max_bytes=None, limit=100):
+        return self.trash.purge(max_age, max_bytes, limit)
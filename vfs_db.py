@@ -0,0 +1,57 @@
+### vfs_db.py
+import os
+import sqlite3
+import threading
+from contextlib import contextmanager
+
+
+class Database:
+    # Small SQLite wrapper shared by the on-disk indexes. Each thread gets its own
+    # connection; transaction() nests and takes the write lock up front so that
+    # concurrent threads and processes serialize cleanly.
+    def __init__(self, path, schema):
+        self.path = path
+        self.schema = schema
+        self._local = threading.local()
+
+    def connect(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            conn.row_factory = sqlite3.Row
+            # The databases live inside the VFS root, which may be a network share
+            # where WAL does not work; DELETE also converts files left in WAL mode
+            conn.execute("PRAGMA journal_mode=DELETE")
+            conn.executescript(self.schema)
+            self._local.conn = conn
+            self._local.depth = 0
+        return conn
+
+    def execute(self, sql, params=()):
+        return self.connect().execute(sql, params)
+
+    @contextmanager
+    def transaction(self):
+        conn = self.connect()
+        depth = self._local.depth
+        if depth == 0:
+            conn.execute("BEGIN IMMEDIATE")
+        self._local.depth = depth + 1
+        try:
+            yield conn
+        except BaseException:
+            if depth == 0:
+                conn.execute("ROLLBACK")
+            raise
+        else:
+            if depth == 0:
+                conn.execute("COMMIT")
+        finally:
+            self._local.depth = depth
+
+    def close(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is not None:
+            conn.close()
+            self._local.conn = None
@@ -0,0 +1,169 @@
+### vfs_dedupe.py
+import os
+import mmap
+import hashlib
+import logging
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from vfs_db import Database
+
+BLOCK_SIZE = 64 * 1024
+
+# Callers are usually multi-threaded (the app's job pool, the content indexer,
+# the trash purger), and a forked child can inherit a lock another thread held
+# at fork time; start hashing processes from a clean interpreter instead
+START_METHOD = "forkserver" if "forkserver" in multiprocessing.get_all_start_methods() else "spawn"
+
+HASH_SCHEMA = """
+CREATE TABLE IF NOT EXISTS hashes (
+    dev INTEGER NOT NULL,
+    ino INTEGER NOT NULL,
+    mtime_ns INTEGER NOT NULL,
+    size INTEGER NOT NULL,
+    partial TEXT,
+    full TEXT,
+    PRIMARY KEY (dev, ino, mtime_ns, size)
+) WITHOUT ROWID;
+"""
+
+
+def partial_hash(path, block_size=BLOCK_SIZE):
+    # Hashes the first and last block; files that fit in two blocks are read whole
+    with open(path, "rb") as file:
+        digest = hashlib.sha256(file.read(block_size))
+        size = os.fstat(file.fileno()).st_size
+        if size > block_size:
+            file.seek(max(block_size, size - block_size))
+            digest.update(file.read(block_size))
+    return digest.hexdigest()
+
+
+def full_hash(path):
+    with open(path, "rb") as file:
+        if os.fstat(file.fileno()).st_size == 0:
+            return hashlib.sha256().hexdigest()
+        with mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+            return hashlib.sha256(mapped).hexdigest()
+
+
+def _hash_job(job):
+    kind, path = job
+    try:
+        return full_hash(path) if kind == "full" else partial_hash(path)
+    except OSError as e:
+        logging.error(f"Failed to hash {path}: {e}")
+        return None
+
+
+class HashCache:
+    # Remembers partial and full digests by (device, inode, mtime, size), so
+    # unchanged files are never read again by later scans
+    def __init__(self, path):
+        self.db = Database(path, HASH_SCHEMA)
+
+    def get(self, key):
+        row = self.db.execute(
+            "SELECT partial, full FROM hashes WHERE dev = ? AND ino = ? AND mtime_ns = ? AND size = ?", key
+        ).fetchone()
+        return (row["partial"], row["full"]) if row is not None else (None, None)
+
+    def put(self, key, partial=None, full=None):
+        with self.db.transaction() as conn:
+            conn.execute("INSERT OR IGNORE INTO hashes VALUES (?, ?, ?, ?, NULL, NULL)", key)
+            if partial is not None:
+                conn.execute("UPDATE hashes SET partial = ? WHERE dev = ? AND ino = ? AND mtime_ns = ? AND size = ?",
+                             (partial,) + key)
+            if full is not None:
+                conn.execute("UPDATE hashes SET full = ? WHERE dev = ? AND ino = ? AND mtime_ns = ? AND size = ?",
+                             (full,) + key)
+
+    def close(self):
+        self.db.close()
+
+
+class DuplicateFinder:
+    # Narrows candidates in stages: equal size, then equal first/last blocks,
+    # then equal full content. Only the last stage reads whole files, and only
+    # for files that survived the cheaper ones.
+    def __init__(self, cache_path=None, workers=None, block_size=BLOCK_SIZE):
+        self.cache = HashCache(cache_path) if cache_path is not None else None
+        self.workers = workers
+        self.block_size = block_size
+
+    def _key(self, path):
+        stats = os.stat(path)
+        return (stats.st_dev, stats.st_ino, stats.st_mtime_ns, stats.st_size)
+
+    def _hash_all(self, kind, paths, keys, executor):
+        digests = {}
+        jobs = []
+        for path in paths:
+            cached = self.cache.get(keys[path]) if self.cache is not None else (None, None)
+            digest = cached[1] if kind == "full" else cached[0]
+            if digest is not None:
+                digests[path] = digest
+            else:
+                jobs.append(path)
+        if jobs:
+            results = executor.map(_hash_job, [(kind, path) for path in jobs], chunksize=16)
+            for path, digest in zip(jobs, results):
+                if digest is None:
+                    continue
+                digests[path] = digest
+                if self.cache is not None:
+                    self.cache.put(keys[path], **{kind: digest})
+        return digests
+
+    def _regroup(self, groups, digests):
+        regrouped = {}
+        for group_key, paths in groups.items():
+            for path in paths:
+                if path in digests:
+                    regrouped.setdefault((group_key, digests[path]), []).append(path)
+        return {key: paths for key, paths in regrouped.items() if len(paths) > 1}
+
+    def find(self, files, min_size=1):
+        # files yields (path, size); returns [{"size", "digest", "paths"}] for every
+        # set of two or more identical files, largest reclaimable space first
+        by_size = {}
+        for path, size in files:
+            if size >= min_size:
+                by_size.setdefault(size, []).append(path)
+        by_size = {size: paths for size, paths in by_size.items() if len(paths) > 1}
+        if not by_size:
+            return []
+        keys = {}
+        for paths in by_size.values():
+            for path in list(paths):
+                try:
+                    keys[path] = self._key(path)
+                except OSError:
+                    paths.remove(path)
+        with ProcessPoolExecutor(self.workers, mp_context=multiprocessing.get_context(START_METHOD)) as executor:
+            candidates = [path for paths in by_size.values() for path in paths]
+            partial = self._regroup(by_size, self._hash_all("partial", candidates, keys, executor))
+            # Files no bigger than two blocks were hashed whole by the partial stage
+            small = {key: paths for key, paths in partial.items() if key[0] <= 2 * self.block_size}
+            large = {key: paths for key, paths in partial.items() if key[0] > 2 * self.block_size}
+            candidates = [path for paths in large.values() for path in paths]
+            full = self._regroup(large, self._hash_all("full", candidates, keys, executor))
+        groups = [
+            {"size": size, "digest": digest, "paths": sorted(paths)}
+            for (size, digest), paths in small.items()
+        ]
+        groups.extend(
+            {"size": size, "digest": digest, "paths": sorted(paths)}
+            for ((size, _), digest), paths in full.items()
+        )
+        groups.sort(key=lambda group: -group["size"] * (len(group["paths"]) - 1))
+        return groups
+
+    def find_in_metadata(self, manager, min_size=1):
+        # Candidates come straight from the MetadataManager's size index
+        return self.find(
+            (path, meta["size"]) for path, meta in manager.query(size=(min_size, None), order_by="size")
+        )
+
+    def close(self):
+        if self.cache is not None:
+            self.cache.close()
@@ -0,0 +1,275 @@
+### vfs_fulltext.py
+import os
+import re
+import codecs
+import logging
+import threading
+from array import array
+from bisect import bisect_left
+from concurrent.futures import ThreadPoolExecutor
+
+TOKEN = re.compile(r"\w+")
+QUERY_TERM = re.compile(r'"([^"]*)"?|(\S+)')
+MAX_INDEX_BYTES = 8 * 1024 * 1024
+SNIPPET_CONTEXT = 40
+# New tokens are folded into the sorted vocabulary in batches of this size
+VOCAB_MERGE = 4096
+
+
+def tokenize(text):
+    return [token.lower() for token in TOKEN.findall(text)]
+
+
+class ContentIndex:
+    # Inverted index over the contents of the files in a VFS root. Files are
+    # (re)indexed on a small thread pool whenever the VFS reports a change, and
+    # every posting keeps token positions so phrases can be matched. The byte
+    # offset of every position is kept too, so snippets only read a small window.
+    def __init__(self, vfs, workers=2, max_bytes=MAX_INDEX_BYTES):
+        self.vfs = vfs
+        self.max_bytes = max_bytes
+        self._lock = threading.Condition()
+        self._postings = {}
+        self._docs = {}
+        self._offsets = {}
+        # Sorted tokens for prefix lookups; it may still hold tokens that are gone
+        self._vocab = []
+        self._new_tokens = set()
+        self._scheduled = {}
+        self._pending = 0
+        self._executor = ThreadPoolExecutor(workers, thread_name_prefix="content-index")
+        vfs.add_listener(self.on_event)
+
+    def build(self):
+        with self._lock:
+            self._postings.clear()
+            self._docs.clear()
+            self._offsets.clear()
+            self._vocab = []
+            self._new_tokens.clear()
+        for file_name in self.vfs.list_files():
+            self.schedule(file_name)
+
+    def on_event(self, event, file_name):
+        if event == "deleted":
+            self.remove(file_name)
+        elif event == "root":
+            self.build()
+        else:
+            self.schedule(file_name)
+
+    def schedule(self, file_name):
+        # Only the newest request for a file is applied; older ones finish as no-ops
+        with self._lock:
+            ticket = self._scheduled.get(file_name, 0) + 1
+            self._scheduled[file_name] = ticket
+            self._pending += 1
+        try:
+            self._executor.submit(self._index_file, file_name, ticket)
+        except RuntimeError:
+            self._finish()
+
+    def _finish(self):
+        with self._lock:
+            self._pending -= 1
+            self._lock.notify_all()
+
+    def wait(self, timeout=None):
+        with self._lock:
+            return self._lock.wait_for(lambda: self._pending == 0, timeout)
+
+    def _read_text(self, file_name):
+        file_path = os.path.join(self.vfs.root_directory, file_name)
+        with open(file_path, "rb") as file:
+            data = file.read(self.max_bytes)
+        # Binary files have nothing useful to search
+        if b"\0" in data[:8192]:
+            return None
+        # surrogateescape round-trips invalid bytes, which keeps byte offsets exact
+        return data.decode("utf-8", errors="surrogateescape")
+
+    def _index_file(self, file_name, ticket):
+        try:
+            try:
+                text = self._read_text(file_name)
+            except FileNotFoundError:
+                text = None
+            positions = {}
+            offsets = array("Q")
+            if text is not None:
+                offset, previous = 0, 0
+                for position, match in enumerate(TOKEN.finditer(text)):
+                    offset += len(text[previous:match.start()].encode("utf-8", "surrogateescape"))
+                    previous = match.start()
+                    offsets.append(offset)
+                    positions.setdefault(match.group().lower(), []).append(position)
+            with self._lock:
+                if self._scheduled.get(file_name) != ticket:
+                    return
+                del self._scheduled[file_name]
+                self._drop(file_name)
+                if text is not None:
+                    self._docs[file_name] = set(positions)
+                    self._offsets[file_name] = offsets
+                    for token, where in positions.items():
+                        if token not in self._postings:
+                            self._postings[token] = {}
+                            self._new_tokens.add(token)
+                        self._postings[token][file_name] = where
+                    if len(self._new_tokens) > VOCAB_MERGE:
+                        self._merge_vocab()
+        except Exception as e:
+            logging.error(f"Failed to index {file_name}: {e}")
+        finally:
+            self._finish()
+
+    def _merge_vocab(self):
+        # Called with the lock held; also sheds tokens whose postings are gone
+        vocab = {token for token in self._vocab if token in self._postings}
+        vocab.update(self._new_tokens)
+        self._vocab = sorted(vocab)
+        self._new_tokens.clear()
+
+    def _drop(self, file_name):
+        self._offsets.pop(file_name, None)
+        for token in self._docs.pop(file_name, ()):
+            docs = self._postings.get(token)
+            if docs is not None:
+                docs.pop(file_name, None)
+                if not docs:
+                    del self._postings[token]
+
+    def remove(self, file_name):
+        with self._lock:
+            # Cancels any indexing still in flight for the file
+            self._scheduled.pop(file_name, None)
+            self._drop(file_name)
+
+    def _parse(self, query):
+        terms = []
+        for phrase, word in QUERY_TERM.findall(query):
+            tokens = tokenize(phrase if phrase else word)
+            if tokens:
+                terms.append(tokens)
+        return terms
+
+    def _expand(self, token):
+        # Tokens that start with a partially typed word, called with the lock held
+        found = {candidate for candidate in self._new_tokens if candidate.startswith(token)}
+        vocab = self._vocab
+        i = bisect_left(vocab, token)
+        while i < len(vocab) and vocab[i].startswith(token):
+            found.add(vocab[i])
+            i += 1
+        return [candidate for candidate in found if candidate in self._postings]
+
+    def _term_hits(self, tokens, prefix):
+        # {file_name: occurrences} for a token or phrase, called with the lock held
+        if len(tokens) == 1:
+            hits = {}
+            for token in self._expand(tokens[0]) if prefix else tokens:
+                for file_name, where in self._postings.get(token, {}).items():
+                    hits[file_name] = hits.get(file_name, 0) + len(where)
+            return hits
+        postings = [self._postings.get(token) for token in tokens]
+        if not all(postings):
+            return {}
+        hits = {}
+        for file_name in set.intersection(*(set(docs) for docs in postings)):
+            following = [set(docs[file_name]) for docs in postings[1:]]
+            count = sum(
+                1 for start in postings[0][file_name]
+                if all(start + offset + 1 in where for offset, where in enumerate(following))
+            )
+            if count:
+                hits[file_name] = count
+        return hits
+
+    def _first_position(self, tokens, prefix, file_name):
+        # Position of the first occurrence of a token or phrase, called with the lock held
+        if len(tokens) == 1:
+            starts = [
+                self._postings[token][file_name][0]
+                for token in (self._expand(tokens[0]) if prefix else tokens)
+                if file_name in self._postings.get(token, {})
+            ]
+            return min(starts, default=None)
+        postings = [self._postings[token][file_name] for token in tokens]
+        following = [set(where) for where in postings[1:]]
+        for start in postings[0]:
+            if all(start + offset + 1 in where for offset, where in enumerate(following)):
+                return start
+        return None
+
+    def search(self, query, limit=50, prefix=False):
+        # Every bare word and "quoted phrase" in the query must occur. With
+        # prefix=True the last bare word also matches longer tokens, which is
+        # what a search box updated on each keystroke wants.
+        terms = self._parse(query)
+        if not terms:
+            return []
+        scores = None
+        first_prefix = prefix and len(terms) == 1 and not query.rstrip().endswith('"')
+        with self._lock:
+            for i, tokens in enumerate(terms):
+                last_word = prefix and i == len(terms) - 1 and not query.rstrip().endswith('"')
+                hits = self._term_hits(tokens, last_word)
+                if scores is None:
+                    scores = hits
+                else:
+                    scores = {name: scores[name] + count for name, count in hits.items() if name in scores}
+                if not scores:
+                    return []
+            ranked = sorted(scores.items(), key=lambda item: (-item[1], item[0]))[:limit]
+            spans = []
+            for name, score in ranked:
+                position = self._first_position(terms[0], first_prefix, name)
+                offsets = self._offsets.get(name)
+                if position is None or offsets is None:
+                    spans.append(None)
+                else:
+                    spans.append((offsets[position], offsets[position + len(terms[0]) - 1]))
+        return [
+            {"file_name": name, "score": score, "snippet": self.snippet(name, terms[0], span)}
+            for (name, score), span in zip(ranked, spans)
+        ]
+
+    def snippet(self, file_name, tokens, span):
+        # span holds the byte offsets of the first and last token of the match;
+        # only the bytes around it are read, at most 4 per character of context
+        if span is None:
+            return ""
+        margin = 4 * (SNIPPET_CONTEXT + len(tokens[-1]))
+        window_start = max(0, span[0] - 4 * SNIPPET_CONTEXT)
+        file_path = os.path.join(self.vfs.root_directory, file_name)
+        try:
+            with open(file_path, "rb") as file:
+                file.seek(window_start)
+                data = file.read(span[1] + margin - window_start)
+                at_end = not file.read(1)
+        except OSError:
+            return ""
+        # Window edges may split a character: skip continuation bytes at the
+        # start, and let the decoder hold back an unfinished one at the end
+        skip = 0
+        while skip < min(3, len(data)) and window_start and data[skip] & 0xC0 == 0x80:
+            skip += 1
+        decode = codecs.getincrementaldecoder("utf-8")("replace").decode
+        text = decode(data[skip:], at_end)
+        # The match starts on a character boundary, so its prefix decodes the same way
+        match_start = len(decode(data[skip:span[0] - window_start], True))
+        pattern = r"\W+".join(re.escape(token) for token in tokens)
+        match = re.compile(pattern, re.IGNORECASE).search(text, match_start)
+        if match is None:
+            return ""
+        match_start = match.start()
+        start = max(0, match_start - SNIPPET_CONTEXT)
+        end = min(len(text), match_start + len(match.group()) + SNIPPET_CONTEXT)
+        snippet = " ".join(text[start:end].split())
+        more_before = start > 0 or window_start > 0
+        more_after = end < len(text) or not at_end
+        return ("..." if more_before else "") + snippet + ("..." if more_after else "")
+
+    def close(self):
+        self.vfs.remove_listener(self.on_event)
+        self._executor.shutdown(wait=True, cancel_futures=True)
@@ -0,0 +1,101 @@
+### vfs_indexer.py
+import os
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+BATCH_SIZE = 1000
+
+
+class ParallelIndexer:
+    # Walks a tree with os.scandir on a pool of threads, one task per directory,
+    # taking stat results from the directory entries. Files are handed to
+    # on_batch(rows) as (path, size, ctime, mtime) tuples while the walk is
+    # still running, and every directory's mtime is collected for the index.
+    def __init__(self, root_directory, ignored=(), workers=None, on_batch=None,
+                 progress=None, cancel_event=None, batch_size=BATCH_SIZE):
+        self.root_directory = root_directory
+        self.ignored = set(ignored)
+        self.workers = workers or min(32, (os.cpu_count() or 1) * 4)
+        self.on_batch = on_batch
+        self.progress = progress
+        self.cancel_event = cancel_event or threading.Event()
+        self.batch_size = batch_size
+        self.dirs = {}
+        self.files_done = 0
+        self.dirs_done = 0
+        self._lock = threading.Condition()
+        self._pending = 0
+        self._executor = None
+
+    def run(self):
+        try:
+            self.dirs[self.root_directory] = os.stat(self.root_directory).st_mtime_ns
+        except OSError as e:
+            logging.error(f"Cannot index {self.root_directory}: {e}")
+            return False
+        with ThreadPoolExecutor(self.workers, thread_name_prefix="indexer") as executor:
+            self._executor = executor
+            self._submit(self.root_directory)
+            with self._lock:
+                while self._pending and not self.cancel_event.is_set():
+                    self._lock.wait(0.1)
+            if self.cancel_event.is_set():
+                executor.shutdown(wait=True, cancel_futures=True)
+        return not self.cancel_event.is_set()
+
+    def cancel(self):
+        self.cancel_event.set()
+
+    def _submit(self, directory):
+        with self._lock:
+            self._pending += 1
+        try:
+            self._executor.submit(self._scan, directory)
+        except RuntimeError:
+            # The pool is shutting down after a cancel
+            self._finish(0)
+
+    def _finish(self, files):
+        with self._lock:
+            self._pending -= 1
+            self.files_done += files
+            self.dirs_done += 1
+            files_done, dirs_done = self.files_done, self.dirs_done
+            self._lock.notify_all()
+        if self.progress is not None:
+            self.progress(files_done, dirs_done)
+
+    def _scan(self, directory):
+        rows = []
+        count = 0
+        try:
+            if self.cancel_event.is_set():
+                return
+            with os.scandir(directory) as entries:
+                for entry in entries:
+                    try:
+                        if entry.is_dir(follow_symlinks=False):
+                            if entry.name not in self.ignored:
+                                self.dirs[entry.path] = entry.stat(follow_symlinks=False).st_mtime_ns
+                                self._submit(entry.path)
+                        elif entry.is_file():
+                            stats = entry.stat()
+                            rows.append((entry.path, stats.st_size, stats.st_ctime, stats.st_mtime))
+                    except OSError as e:
+                        logging.error(f"Failed to fetch metadata for {entry.path}: {e}")
+                        continue
+                    if len(rows) >= self.batch_size:
+                        count += len(rows)
+                        self._emit(rows)
+                        rows = []
+            count += len(rows)
+            self._emit(rows)
+        except OSError as e:
+            logging.error(f"Failed to scan {directory}: {e}")
+        finally:
+            self._finish(count)
+
+    def _emit(self, rows):
+        if rows and self.on_batch is not None and not self.cancel_event.is_set():
+            self.on_batch(rows)
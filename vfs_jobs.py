@@ -0,0 +1,128 @@
+### vfs_jobs.py
+import queue
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+JOB_WORKERS = 4
+POLL_INTERVAL = 50
+
+
+class Job:
+    def __init__(self, name, scheduler, on_progress):
+        self.name = name
+        self.state = "queued"
+        self.cancel_event = threading.Event()
+        self._scheduler = scheduler
+        self._on_progress = on_progress
+        self._latest = None
+        self._lock = threading.Lock()
+
+    @property
+    def cancelled(self):
+        return self.cancel_event.is_set()
+
+    def cancel(self):
+        self.cancel_event.set()
+
+    def progress(self, done, total=None, text=None):
+        # Called from the worker; only the newest report reaches the UI
+        if self._on_progress is None:
+            return
+        with self._lock:
+            pending = self._latest is not None
+            self._latest = (done, total, text)
+        if not pending:
+            self._scheduler._post(self._deliver_progress)
+
+    def _deliver_progress(self):
+        with self._lock:
+            latest, self._latest = self._latest, None
+        if latest is not None:
+            self._on_progress(*latest)
+
+
+class JobScheduler:
+    # Runs blocking work on worker threads and hands results back to the Tk
+    # thread. Workers never touch widgets: they queue callbacks, and the Tk
+    # thread drains that queue every POLL_INTERVAL ms with root.after().
+    def __init__(self, root, workers=JOB_WORKERS, on_change=None, poll_interval=POLL_INTERVAL):
+        self.root = root
+        self.on_change = on_change
+        self.poll_interval = poll_interval
+        self.jobs = []
+        self._callbacks = queue.SimpleQueue()
+        self._executor = ThreadPoolExecutor(workers, thread_name_prefix="ui-job")
+        self._closed = False
+        self.root.after(self.poll_interval, self._drain)
+
+    def submit(self, name, func, *args, on_done=None, on_error=None, on_progress=None, with_job=False):
+        # func(*args) runs on a worker, or func(job, *args) with with_job=True so
+        # it can report progress and stop early once job.cancelled is set; such a
+        # job's result still reaches on_done. on_done(result) and on_error(exception)
+        # run on the Tk thread. Cancelled plain jobs get neither callback.
+        job = Job(name, self, on_progress)
+        self.jobs.append(job)
+        self._changed()
+        self._executor.submit(self._run, job, func, args, on_done, on_error, with_job)
+        return job
+
+    def _run(self, job, func, args, on_done, on_error, with_job):
+        # Jobs that handle cancellation themselves still run, to report what they skipped
+        if job.cancelled and not with_job:
+            job.state = "cancelled"
+            self._post(self._finish, job)
+            return
+        job.state = "running"
+        self._post(self._changed)
+        try:
+            result = func(job, *args) if with_job else func(*args)
+        except Exception as e:
+            job.state = "failed"
+            if on_error is not None and not job.cancelled:
+                self._post(on_error, e)
+            else:
+                logging.error(f"Job '{job.name}' failed: {e}")
+        else:
+            job.state = "cancelled" if job.cancelled else "done"
+            if on_done is not None and (with_job or not job.cancelled):
+                self._post(on_done, result)
+        self._post(self._finish, job)
+
+    def _post(self, callback, *args):
+        self._callbacks.put((callback, args))
+
+    def _drain(self):
+        while True:
+            try:
+                callback, args = self._callbacks.get_nowait()
+            except queue.Empty:
+                break
+            try:
+                callback(*args)
+            except Exception as e:
+                logging.error(f"Job callback failed: {e}")
+        if not self._closed:
+            self.root.after(self.poll_interval, self._drain)
+
+    def _finish(self, job):
+        if job in self.jobs:
+            self.jobs.remove(job)
+        self._changed()
+
+    def _changed(self):
+        if self.on_change is not None:
+            self.on_change(self.counts())
+
+    def counts(self):
+        running = sum(1 for job in self.jobs if job.state == "running")
+        return {"queued": len(self.jobs) - running, "running": running}
+
+    def cancel_all(self):
+        for job in list(self.jobs):
+            job.cancel()
+
+    def shutdown(self):
+        self._closed = True
+        self.cancel_all()
+        self._executor.shutdown(wait=False, cancel_futures=True)
@@ -0,0 +1,295 @@
+### vfs_journal.py
+import os
+import json
+import uuid
+import base64
+import logging
+import threading
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+    import msvcrt
+
+INLINE_LIMIT = 64 * 1024
+CHECKPOINT_BYTES = 4 * 1024 * 1024
+
+
+def _try_lock(file):
+    try:
+        if fcntl is not None:
+            fcntl.flock(file.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+        else:
+            msvcrt.locking(file.fileno(), msvcrt.LK_NBLCK, 1)
+        return True
+    except OSError:
+        return False
+
+
+def _same_file(file, path):
+    try:
+        return os.path.samestat(os.fstat(file.fileno()), os.stat(path))
+    except OSError:
+        return False
+
+
+def _remove(path):
+    try:
+        os.remove(path)
+    except OSError as e:
+        # Windows refuses while another process still has it open; a later recovery retries
+        logging.error(f"Could not remove journal {path}: {e}")
+
+
+def _fsync_path(path):
+    try:
+        fd = os.open(path, os.O_RDONLY)
+    except OSError:
+        return
+    try:
+        os.fsync(fd)
+    except OSError:
+        pass
+    finally:
+        os.close(fd)
+
+
+class Journal:
+    # Append-only redo log for VFS mutations. Every process writes its own
+    # wal-<id>-<generation>.log under an exclusive lock; intents are made durable with group
+    # commit (one fsync covers every record appended while the previous fsync
+    # was running) and applied files are only fsynced at checkpoints.
+    def __init__(self, journal_dir, inline_limit=INLINE_LIMIT, group_window=0.0,
+                 checkpoint_bytes=CHECKPOINT_BYTES):
+        self.journal_dir = journal_dir
+        self.staged_dir = os.path.join(journal_dir, "staged")
+        self.inline_limit = inline_limit
+        self.group_window = group_window
+        self.checkpoint_bytes = checkpoint_bytes
+        self.journal_id = uuid.uuid4().hex
+        # wal-<id>-<generation>.log; every checkpoint moves on to a new generation
+        self.path = None
+        self._generation = 0
+        self.metrics = {"records": 0, "fsyncs": 0, "checkpoints": 0}
+        self._cond = threading.Condition()
+        self._file = None
+        self._next_txid = 1
+        self._appended = 0
+        self._synced = 0
+        self._syncing = False
+        self._staged_seq = 0
+        self._pending = {}
+        self._dirty = set()
+
+    def _create(self):
+        # Creates the next generation under its final name and locks it. Nothing
+        # is renamed while open, which Windows does not allow. Recovery in another
+        # process may claim the empty file between the two steps; then try again.
+        while True:
+            self._generation += 1
+            path = os.path.join(self.journal_dir, f"wal-{self.journal_id}-{self._generation}.log")
+            file = open(path, "xb")
+            if _try_lock(file) and _same_file(file, path):
+                return path, file
+            file.close()
+
+    def _open(self):
+        if self._file is None:
+            os.makedirs(self.staged_dir, exist_ok=True)
+            self.path, self._file = self._create()
+        return self._file
+
+    def stage(self, chunks):
+        # Small payloads travel inside the journal record; large ones are spilled
+        # to a staged file that is fsynced before the record is logged
+        buffered = []
+        size = 0
+        chunks = iter(chunks)
+        for chunk in chunks:
+            data = chunk.encode("utf-8") if isinstance(chunk, str) else bytes(chunk)
+            buffered.append(data)
+            size += len(data)
+            if size > self.inline_limit:
+                break
+        else:
+            return {"data": base64.b64encode(b"".join(buffered)).decode("ascii")}
+        with self._cond:
+            self._open()
+            self._staged_seq += 1
+            staged_name = f"{self.journal_id}-{self._staged_seq}"
+        staged_path = os.path.join(self.staged_dir, staged_name)
+        try:
+            with open(staged_path, "wb") as file:
+                for data in buffered:
+                    file.write(data)
+                for chunk in chunks:
+                    file.write(chunk.encode("utf-8") if isinstance(chunk, str) else chunk)
+                file.flush()
+                os.fsync(file.fileno())
+        except BaseException:
+            os.remove(staged_path)
+            raise
+        return {"staged": staged_name}
+
+    def payload_data(self, payload):
+        return base64.b64decode(payload["data"]) if "data" in payload else None
+
+    def staged_path(self, payload):
+        return os.path.join(self.staged_dir, payload["staged"]) if "staged" in payload else None
+
+    def discard(self, payload):
+        staged_path = self.staged_path(payload)
+        if staged_path is not None and os.path.exists(staged_path):
+            os.remove(staged_path)
+
+    def log(self, op, name, payload=None, before=None):
+        # before identifies the target as it was when the intent was logged, so
+        # recovery can tell whether anything has touched it since
+        record = {"op": op, "name": name, "before": before}
+        if payload is not None:
+            record.update(payload)
+        with self._cond:
+            file = self._open()
+            txid = self._next_txid
+            self._next_txid += 1
+            record["txid"] = txid
+            line = (json.dumps(record) + "\n").encode("utf-8")
+            file.write(line)
+            self._pending[txid] = line
+            self._appended += 1
+            self.metrics["records"] += 1
+            self._commit(self._appended)
+        return txid
+
+    def _commit(self, lsn):
+        # Called with the lock held. The first waiter becomes the leader and
+        # fsyncs for everyone; the rest wait for a sync that covers them.
+        while self._synced < lsn:
+            if self._syncing:
+                self._cond.wait()
+                continue
+            self._syncing = True
+            try:
+                if self.group_window:
+                    self._cond.wait(self.group_window)
+                target = self._appended
+                self._file.flush()
+                fd = self._file.fileno()
+                self._cond.release()
+                try:
+                    os.fsync(fd)
+                finally:
+                    self._cond.acquire()
+                self._synced = max(self._synced, target)
+                self.metrics["fsyncs"] += 1
+            finally:
+                self._syncing = False
+                self._cond.notify_all()
+
+    def done(self, txid, *paths):
+        with self._cond:
+            file = self._open()
+            file.write((json.dumps({"txid": txid, "done": True}) + "\n").encode("utf-8"))
+            # Not fsynced, but out of our buffer: a killed process must not
+            # leave an operation that already finished looking unfinished
+            file.flush()
+            self._pending.pop(txid, None)
+            for path in paths:
+                self._dirty.add(path)
+                self._dirty.add(os.path.dirname(path))
+            if file.tell() > self.checkpoint_bytes and not self._syncing:
+                self._checkpoint()
+
+    def _checkpoint(self):
+        # Called with the lock held: make applied files durable, then start a
+        # fresh journal that only carries the still-pending intents
+        for path in self._dirty:
+            _fsync_path(path)
+        self._dirty.clear()
+        old_path, old_file = self.path, self._file
+        self.path, new_file = self._create()
+        for line in self._pending.values():
+            new_file.write(line)
+        new_file.flush()
+        os.fsync(new_file.fileno())
+        _fsync_path(self.journal_dir)
+        # Empty the old generation while it is still locked, so a recovery that
+        # claims it after we let go finds nothing to replay twice
+        old_file.truncate(0)
+        old_file.close()
+        _remove(old_path)
+        self._file = new_file
+        self._synced = self._appended
+        self.metrics["checkpoints"] += 1
+
+    def checkpoint(self):
+        with self._cond:
+            if self._file is not None:
+                self._checkpoint()
+
+    def recover(self, replay):
+        # Replays intents without a matching "done" from journals whose owner
+        # is gone (their lock is free), then removes those journals
+        if not os.path.isdir(self.journal_dir):
+            return 0
+        replayed = 0
+        recovered = set()
+        for fname in sorted(os.listdir(self.journal_dir)):
+            if not (fname.startswith("wal-") and fname.endswith(".log")):
+                continue
+            path = os.path.join(self.journal_dir, fname)
+            if path == self.path:
+                continue
+            with open(path, "rb+") as file:
+                if not _try_lock(file):
+                    continue
+                intents = {}
+                for line in file:
+                    try:
+                        record = json.loads(line)
+                    except ValueError:
+                        # Torn tail from a crash mid-append; it was never acknowledged
+                        break
+                    if record.get("done"):
+                        intents.pop(record["txid"], None)
+                    else:
+                        intents[record["txid"]] = record
+                touched = []
+                for record in intents.values():
+                    try:
+                        touched.extend(replay(record))
+                        replayed += 1
+                    except Exception as e:
+                        logging.error(f"Failed to replay journal record {record}: {e}")
+                for touched_path in touched:
+                    _fsync_path(touched_path)
+                    _fsync_path(os.path.dirname(touched_path))
+                recovered.add(fname[len("wal-"):-len(".log")].split("-")[0])
+                if fcntl is not None:
+                    _remove(path)
+            if fcntl is None:
+                _remove(path)
+        # Staged payloads go once no generation of their journal is left; one
+        # that is still there belongs to a live process
+        remaining = os.listdir(self.journal_dir)
+        for journal_id in recovered:
+            if any(fname.startswith(f"wal-{journal_id}") for fname in remaining):
+                continue
+            for staged in os.listdir(self.staged_dir) if os.path.isdir(self.staged_dir) else []:
+                if staged.startswith(journal_id + "-"):
+                    os.remove(os.path.join(self.staged_dir, staged))
+        return replayed
+
+    def close(self):
+        with self._cond:
+            if self._file is None:
+                return
+            for path in self._dirty:
+                _fsync_path(path)
+            self._dirty.clear()
+            self._file.close()
+            self._file = None
+            # Nothing left to replay once every intent has completed
+            if not self._pending:
+                _remove(self.path)
@@ -0,0 +1,97 @@
+### vfs_locks.py
+import threading
+
+LOCK_SHARDS = 64
+
+
+class _Shard:
+    # Reader/writer state for every path that hashes here, guarded by one
+    # condition. Waiting writers block new readers of their path, so a steady
+    # stream of reads cannot starve an update.
+    def __init__(self):
+        self.cond = threading.Condition(threading.Lock())
+        # path -> [readers, writer active, writers waiting, readers waiting]
+        self.states = {}
+
+    def _state(self, path):
+        state = self.states.get(path)
+        if state is None:
+            state = self.states[path] = [0, False, 0, 0]
+        return state
+
+    def _release(self, path, state):
+        if state[2] or state[3]:
+            self.cond.notify_all()
+        elif not (state[0] or state[1]):
+            del self.states[path]
+
+    def acquire_read(self, path):
+        with self.cond:
+            state = self._state(path)
+            if state[1] or state[2]:
+                state[3] += 1
+                while state[1] or state[2]:
+                    self.cond.wait()
+                state[3] -= 1
+            state[0] += 1
+
+    def release_read(self, path):
+        with self.cond:
+            state = self.states[path]
+            state[0] -= 1
+            if state[0] == 0:
+                self._release(path, state)
+
+    def acquire_write(self, path):
+        with self.cond:
+            state = self._state(path)
+            if state[0] or state[1]:
+                state[2] += 1
+                while state[0] or state[1]:
+                    self.cond.wait()
+                state[2] -= 1
+            state[1] = True
+
+    def release_write(self, path):
+        with self.cond:
+            state = self.states[path]
+            state[1] = False
+            self._release(path, state)
+
+
+class _Guard:
+    __slots__ = ("shard", "path", "write")
+
+    def __init__(self, shard, path, write):
+        self.shard = shard
+        self.path = path
+        self.write = write
+
+    def __enter__(self):
+        if self.write:
+            self.shard.acquire_write(self.path)
+        else:
+            self.shard.acquire_read(self.path)
+
+    def __exit__(self, *exc):
+        if self.write:
+            self.shard.release_write(self.path)
+        else:
+            self.shard.release_read(self.path)
+
+
+class LockTable:
+    # Per-path reader/writer locks. Paths are spread over `shards` independent
+    # tables, each with its own mutex, so operations on different files rarely
+    # contend; a path's state only exists while somebody holds or wants it.
+    def __init__(self, shards=LOCK_SHARDS):
+        self._shards = [_Shard() for _ in range(shards)]
+
+    def read(self, path):
+        return _Guard(self._shards[hash(path) % len(self._shards)], path, False)
+
+    def write(self, path):
+        return _Guard(self._shards[hash(path) % len(self._shards)], path, True)
+
+    def __len__(self):
+        return sum(len(shard.states) for shard in self._shards)
@@ -1,50 +1,408 @@
 ### vfs_metadata.py
 import os
+import stat
 import time
 import logging
+import sqlite3
+import threading
+from vfs_db import Database
+from vfs_watch import create_watcher
+from vfs_indexer import ParallelIndexer
+from vfs_nameindex import NameIndex
+from vfs_columns import FileMeta, MetadataStore
+from vfs_query import QUERY_FIELDS, SortedIndex, in_range, paginate
+
+# VFS bookkeeping directories (version chunks, trash, journal, this index) are not user files
+IGNORED_DIRS = {".versions", ".trash", ".journal", ".metadata"}
+
+INDEX_SCHEMA = """
+CREATE TABLE IF NOT EXISTS files (
+    path TEXT PRIMARY KEY,
+    size INTEGER NOT NULL,
+    ctime REAL NOT NULL,
+    mtime REAL NOT NULL
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS dirs (
+    path TEXT PRIMARY KEY,
+    mtime_ns INTEGER NOT NULL
+) WITHOUT ROWID;
+"""
+
+
+class MetadataIndex:
+    # On-disk copy of the metadata cache plus the mtime of every indexed
+    # directory, used to find the subtrees that changed since the last run
+    def __init__(self, path):
+        self.path = path
+        self.db = Database(path, INDEX_SCHEMA)
+
+    def exists(self):
+        return os.path.exists(self.path)
+
+    def load_files(self):
+        return self.db.execute("SELECT path, size, ctime, mtime FROM files").fetchall()
+
+    def load_dirs(self):
+        return dict(self.db.execute("SELECT path, mtime_ns FROM dirs").fetchall())
+
+    def replace_all(self, files, dirs):
+        with self.db.transaction() as conn:
+            conn.execute("DELETE FROM files")
+            conn.execute("DELETE FROM dirs")
+            conn.executemany("INSERT INTO files VALUES (?, ?, ?, ?)", files)
+            conn.executemany("INSERT INTO dirs VALUES (?, ?)", dirs.items())
+
+    def put_file(self, path, size, ctime, mtime):
+        self.db.execute("INSERT OR REPLACE INTO files VALUES (?, ?, ?, ?)", (path, size, ctime, mtime))
+
+    def remove_file(self, path):
+        self.db.execute("DELETE FROM files WHERE path = ?", (path,))
+
+    def put_dir(self, path, mtime_ns):
+        self.db.execute("INSERT OR REPLACE INTO dirs VALUES (?, ?)", (path, mtime_ns))
+
+    def remove_dir(self, path):
+        self.db.execute("DELETE FROM dirs WHERE path = ?", (path,))
+
 
 class MetadataManager:
-    def __init__(self, root_directory=None):
+    def __init__(self, root_directory=None, watch=False, poll_interval=2.0, persistent=True, workers=None,
+                 index_path=None):
         self.root_directory = root_directory or os.getcwd()
-        self.metadata_cache = self.index_files()
-
-    def index_files(self):
-        metadata = {}
-        for root, _, files in os.walk(self.root_directory):
-            for file in files:
-                file_path = os.path.join(root, file)
-                metadata[file_path] = self.get_metadata(file_path)
+        self.workers = workers
+        self._lock = threading.RLock()
+        self._refresh_lock = threading.Lock()
+        self._missed = None
+        self.metadata_cache = MetadataStore()
+        self.names = NameIndex()
+        # Sorted indexes over QUERY_FIELDS, built on first query; None when stale
+        self._sorted = None
+        self.watcher = None
+        self.index = None
+        indexed = False
+        if persistent:
+            # The index can live outside the tree it describes, e.g. for read-only shares
+            indexed = self._open_index(index_path or os.path.join(self.root_directory, ".metadata", "index.db"))
+        # Start watching before the cache is filled so no change slips between the
+        # two; events seen during a walk are replayed once it finishes
+        if watch:
+            self.start_watching(poll_interval)
+        if indexed:
+            try:
+                with self._lock:
+                    self._load_index()
+            except (OSError, sqlite3.Error) as e:
+                self._drop_index(e)
+        if self.index is not None and indexed:
+            self._revalidator = threading.Thread(target=self.revalidate, name="metadata-revalidate", daemon=True)
+            self._revalidator.start()
+        else:
+            self.refresh_cache()
+
+    def _open_index(self, path):
+        # Returns whether a saved index was found. When the index cannot be opened
+        # the manager works from memory alone, as it does with persistent=False.
+        try:
+            index = MetadataIndex(path)
+            existed = index.exists()
+            index.db.connect()
+        except (OSError, sqlite3.Error) as e:
+            logging.error(f"Cannot open metadata index '{path}', keeping metadata in memory: {e}")
+            return False
+        self.index = index
+        return existed
+
+    def _drop_index(self, error):
+        # A failing index only costs persistence; the in-memory cache carries on
+        logging.error(f"Metadata index '{self.index.path}' failed, keeping metadata in memory: {error}")
+        self.index = None
+
+    def _index_call(self, method, *args):
+        if self.index is None:
+            return None
+        try:
+            return getattr(self.index, method)(*args)
+        except (OSError, sqlite3.Error) as e:
+            self._drop_index(e)
+
+    def _entry(self, size, ctime, mtime):
+        return FileMeta(size, ctime, mtime)
+
+    def _load_index(self):
+        self.metadata_cache = MetadataStore(self.index.load_files())
+        self.names = NameIndex()
+        for path in self.metadata_cache:
+            self.names.add(path)
+        self._sorted = None
+
+    def _walk(self, top):
+        for root, dirs, files in os.walk(top):
+            dirs[:] = [d for d in dirs if d not in IGNORED_DIRS]
+            yield root, files
+
+    def index_files(self, progress=None, cancel_event=None):
+        metadata = MetadataStore()
+
+        def on_batch(rows):
+            for row in rows:
+                metadata.put(*row)
+
+        ParallelIndexer(self.root_directory, IGNORED_DIRS, self.workers, on_batch,
+                        progress, cancel_event).run()
         return metadata
 
     def get_metadata(self, file_path):
         try:
             stats = os.stat(file_path)
-            return {
-                "size": stats.st_size,
-                "creation_time": time.ctime(stats.st_ctime),
-                "modification_time": time.ctime(stats.st_mtime),
-            }
+            return self._entry(stats.st_size, stats.st_ctime, stats.st_mtime)
         except Exception as e:
             logging.error(f"Failed to fetch metadata for {file_path}: {e}")
             return {}
 
-    def search_files(self, query, attribute="name"):
+    def search_files(self, query, attribute="name", mode="substring", limit=None):
+        # Name queries go through the trigram index; mode is "substring",
+        # "prefix" or "glob" and results come back best match first
+        if attribute == "name":
+            with self._lock:
+                paths = self.names.search(query, mode, limit)
+                return [(path, self.metadata_cache[path]) for path in paths]
         results = []
-        for file_path, meta in self.metadata_cache.items():
-            if attribute == "name" and query.lower() in os.path.basename(file_path).lower():
-                results.append((file_path, meta))
-            elif attribute in meta and query.lower() in str(meta[attribute]).lower():
+        with self._lock:
+            items = list(self.metadata_cache.items())
+        for file_path, meta in items:
+            if attribute in meta and query.lower() in str(meta[attribute]).lower():
                 results.append((file_path, meta))
-        return results
+        return results[:limit] if limit is not None else results
+
+    def _sorted_indexes(self):
+        # Called with the lock held
+        if self._sorted is None:
+            self._sorted = {
+                field: SortedIndex(self.metadata_cache.column(field))
+                for field in QUERY_FIELDS
+            }
+        return self._sorted
+
+    def query(self, name=None, mode="substring", size=None, ctime=None, mtime=None,
+              order_by=None, offset=0, limit=None):
+        # Lazily yields (path, meta) for files matching every given predicate.
+        # size/ctime/mtime are (low, high) ranges with an inclusive low and an
+        # exclusive high, either of which may be None. order_by is a field or
+        # "name"/"path", prefixed with "-" for descending order; without it,
+        # name matches come back best match first.
+        ranges = {field: bounds for field, bounds in zip(QUERY_FIELDS, (size, ctime, mtime)) if bounds is not None}
+        descending = bool(order_by) and order_by.startswith("-")
+        order_field = order_by.lstrip("-") if order_by else None
+        if order_field not in (None, "name", "path") + QUERY_FIELDS:
+            raise ValueError(f"Cannot order by {order_by}")
+        with self._lock:
+            indexes = self._sorted_indexes()
+            spans = {field: indexes[field].span(*bounds) for field, bounds in ranges.items()}
+            ranked = self.names.search(name, mode, None) if name is not None else None
+            if order_field in indexes:
+                # Walk the order field's index, so pages come out without sorting
+                start, stop = spans.get(order_field, (0, len(indexes[order_field])))
+                items = indexes[order_field].items(start, stop)
+                if descending:
+                    items.reverse()
+                candidates, presorted = [path for _, path in items], True
+            elif ranked is not None and (order_field is None or len(ranked) <= min(
+                    (stop - start for start, stop in spans.values()), default=len(ranked))):
+                candidates, presorted = ranked, order_field is None
+            elif spans:
+                # Drive from the most selective range
+                field = min(spans, key=lambda f: spans[f][1] - spans[f][0])
+                candidates = [path for _, path in indexes[field].items(*spans[field])]
+                presorted = False
+            else:
+                candidates, presorted = list(self.metadata_cache), False
+        names = set(ranked) if ranked is not None else None
+        results = self._filter(candidates, names, ranges)
+        if not presorted:
+            if order_field in ("name", "path"):
+                key = (lambda item: os.path.basename(item[0]).lower()) if order_field == "name" else (lambda item: item[0])
+                results = iter(sorted(results, key=key, reverse=descending))
+            elif order_field is None:
+                results = iter(sorted(results))
+        return paginate(results, offset, limit)
+
+    def _filter(self, candidates, names, ranges):
+        for path in candidates:
+            meta = self.metadata_cache.get(path)
+            # Files removed since the query was planned are skipped
+            if meta is None or (names is not None and path not in names):
+                continue
+            if all(in_range(meta[field], bounds) for field, bounds in ranges.items()):
+                yield path, meta
 
-    def refresh_cache(self):
-        self.metadata_cache = self.index_files()
+    def refresh_cache(self, progress=None, cancel_event=None):
+        # Rebuilds the cache with the parallel indexer. An empty cache is filled
+        # batch by batch as results stream in; otherwise the old cache stays in
+        # service until the new one is complete. Returns False if cancelled.
+        with self._refresh_lock:
+            with self._lock:
+                self._missed = []
+                if self.metadata_cache:
+                    metadata, names = MetadataStore(), NameIndex()
+                else:
+                    metadata, names = self.metadata_cache, self.names
+            rows = []
+
+            def on_batch(batch):
+                with self._lock:
+                    for row in batch:
+                        if row[0] not in metadata:
+                            names.add(row[0])
+                        metadata.put(*row)
+                    if metadata is self.metadata_cache:
+                        self._sorted = None
+                    rows.extend(batch)
+
+            indexer = ParallelIndexer(self.root_directory, IGNORED_DIRS, self.workers, on_batch,
+                                      progress, cancel_event)
+            completed = indexer.run()
+            with self._lock:
+                missed, self._missed = self._missed, None
+                if completed:
+                    self.metadata_cache = metadata
+                    self.names = names
+                    self._sorted = None
+                    self._index_call("replace_all", rows, indexer.dirs)
+                for event in missed:
+                    self._apply(*event)
+            return completed
+
+    def revalidate(self):
+        # Rescans only directories whose mtime moved since the index was saved;
+        # a directory's mtime changes whenever entries are added, removed or renamed
+        stored = self._index_call("load_dirs") or {}
+        for directory, mtime_ns in stored.items():
+            try:
+                current = os.stat(directory).st_mtime_ns
+            except OSError:
+                current = None
+            if current == mtime_ns:
+                continue
+            with self._lock:
+                for file_path in self.metadata_cache.paths_in(directory):
+                    self._remove(file_path)
+                if current is None:
+                    self._index_call("remove_dir", directory)
+                else:
+                    self._rescan_dir(directory, stored)
+
+    def _rescan_dir(self, directory, known_dirs):
+        try:
+            entries = list(os.scandir(directory))
+        except OSError:
+            return
+        for entry in entries:
+            if entry.is_dir(follow_symlinks=False):
+                # Subtrees that did not exist when the index was saved are new
+                if entry.name not in IGNORED_DIRS and entry.path not in known_dirs:
+                    for root, files in self._walk(entry.path):
+                        self._record_dir(root)
+                        for file in files:
+                            self._put(os.path.join(root, file))
+            elif entry.is_file():
+                self._put(entry.path)
+        self._record_dir(directory)
+
+    def _record_dir(self, directory):
+        try:
+            mtime_ns = os.stat(directory).st_mtime_ns
+        except OSError:
+            self._index_call("remove_dir", directory)
+        else:
+            self._index_call("put_dir", directory, mtime_ns)
+
+    def start_watching(self, poll_interval=2.0):
+        if self.watcher is None:
+            self.watcher = create_watcher(self.root_directory, self.apply_event, IGNORED_DIRS, poll_interval)
+            self.watcher.start()
+
+    def stop_watching(self):
+        if self.watcher is not None:
+            self.watcher.stop()
+            self.watcher = None
+
+    def _put(self, file_path):
+        try:
+            stats = os.stat(file_path)
+        except OSError:
+            stats = None
+        if stats is None or not stat.S_ISREG(stats.st_mode):
+            self._remove(file_path)
+            return
+        old = self.metadata_cache.get(file_path)
+        if old is None:
+            self.names.add(file_path)
+        meta = self._entry(stats.st_size, stats.st_ctime, stats.st_mtime)
+        self.metadata_cache[file_path] = meta
+        if self._sorted is not None:
+            for field, index in self._sorted.items():
+                if old is not None:
+                    index.remove(old[field], file_path)
+                index.add(meta[field], file_path)
+        self._index_call("put_file", file_path, stats.st_size, stats.st_ctime, stats.st_mtime)
+
+    def _remove(self, file_path):
+        old = self.metadata_cache.pop(file_path, None)
+        if old is not None:
+            self.names.remove(file_path)
+            if self._sorted is not None:
+                for field, index in self._sorted.items():
+                    index.remove(old[field], file_path)
+        self._index_call("remove_file", file_path)
+
+    def _paths_under(self, directory):
+        return list(self.metadata_cache.paths_under(directory))
+
+    def apply_event(self, event, path, dest=None):
+        if event == "overflow":
+            # Events were dropped, so only a full rescan is trustworthy
+            self.refresh_cache()
+            return
+        with self._lock:
+            if self._missed is not None:
+                self._missed.append((event, path, dest))
+            self._apply(event, path, dest)
+
+    def _apply(self, event, path, dest=None):
+        # Applies one change reported by the watcher to the cache in place
+        if event in ("created", "modified"):
+            self._put(path)
+        elif event == "deleted":
+            self._remove(path)
+        elif event == "moved":
+            self._remove(path)
+            self._put(dest)
+        elif event == "created_dir":
+            for root, files in self._walk(path):
+                self._record_dir(root)
+                for file in files:
+                    self._put(os.path.join(root, file))
+        elif event == "deleted_dir":
+            for file_path in self._paths_under(path):
+                self._remove(file_path)
+        elif event == "moved_dir":
+            for file_path in self._paths_under(path):
+                self._remove(file_path)
+                self._put(dest + file_path[len(path):])
+        # Keep stored directory mtimes current so the next start skips them
+        self._record_dir(os.path.dirname(path))
+        if dest is not None:
+            self._record_dir(os.path.dirname(dest))
 
     def format_metadata(self, file_path, meta):
         return (
             f"File: {os.path.basename(file_path)}\n"
             f"Path: {file_path}\n"
             f"Size: {meta.get('size')} bytes\n"
-            f"Created: {meta.get('creation_time')}\n"
-            f"Modified: {meta.get('modification_time')}\n"
+            f"Created: {self._format_time(meta.get('ctime'))}\n"
+            f"Modified: {self._format_time(meta.get('mtime'))}\n"
         )
+
+    def _format_time(self, timestamp):
+        # get_metadata returns {} when the file could not be read
+        return time.ctime(timestamp) if timestamp is not None else None
@@ -0,0 +1,100 @@
+### vfs_mmap.py
+import os
+import mmap
+import threading
+from collections import OrderedDict
+from contextlib import contextmanager
+
+MAX_IDLE = 32
+
+
+class MappedFile:
+    def __init__(self, path):
+        self.path = path
+        self.refs = 0
+        self.stale = False
+        # The mapping keeps its own descriptor, so the file can be closed now
+        with open(path, "rb") as file:
+            stats = os.fstat(file.fileno())
+            self.identity = (stats.st_ino, stats.st_size, stats.st_mtime_ns)
+            # Zero-length files cannot be mapped
+            self._map = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) if stats.st_size else None
+
+    def view(self):
+        return memoryview(self._map) if self._map is not None else memoryview(b"")
+
+    def close(self):
+        try:
+            if self._map is not None:
+                self._map.close()
+        except BufferError:
+            # A caller kept a slice past its view; the mapping is freed with it
+            pass
+
+
+class MmapCache:
+    # Shares one read-only mapping per file between concurrent readers. Mappings
+    # are reference counted and closed once invalidated and no longer in use.
+    # Unused mappings stay open for reuse, but only the max_idle most recently
+    # used ones: each holds a descriptor and pins its file on disk.
+    def __init__(self, max_idle=MAX_IDLE):
+        self.max_idle = max_idle
+        self._lock = threading.Lock()
+        self._maps = {}
+        self._idle = OrderedDict()
+
+    def _identity(self, path):
+        stats = os.stat(path)
+        return (stats.st_ino, stats.st_size, stats.st_mtime_ns)
+
+    def _retire(self, mapped):
+        self._idle.pop(mapped.path, None)
+        mapped.stale = True
+        if mapped.refs == 0:
+            mapped.close()
+
+    @contextmanager
+    def view(self, path):
+        identity = self._identity(path)
+        with self._lock:
+            mapped = self._maps.get(path)
+            # Files changed behind our back get a fresh mapping
+            if mapped is not None and mapped.identity != identity:
+                self._retire(self._maps.pop(path))
+                mapped = None
+            if mapped is None:
+                mapped = MappedFile(path)
+                self._maps[path] = mapped
+            mapped.refs += 1
+            self._idle.pop(path, None)
+        view = mapped.view()
+        try:
+            yield view
+        finally:
+            try:
+                view.release()
+            except BufferError:
+                pass
+            with self._lock:
+                mapped.refs -= 1
+                if mapped.refs == 0:
+                    if mapped.stale:
+                        mapped.close()
+                    else:
+                        self._idle[path] = mapped
+                        while len(self._idle) > self.max_idle:
+                            _, oldest = self._idle.popitem(last=False)
+                            del self._maps[oldest.path]
+                            self._retire(oldest)
+
+    def invalidate(self, path):
+        with self._lock:
+            mapped = self._maps.pop(path, None)
+            if mapped is not None:
+                self._retire(mapped)
+
+    def close(self):
+        with self._lock:
+            for mapped in self._maps.values():
+                self._retire(mapped)
+            self._maps.clear()
@@ -0,0 +1,148 @@
+### vfs_nameindex.py
+import os
+import re
+import heapq
+import fnmatch
+
+# Names are indexed with two leading and two trailing pad characters, so a
+# prefix or suffix of any length maps to trigrams too ("ab" -> "\0\0a", "\0ab";
+# ".py" -> ".py", "py\1", "y\1\1")
+PAD = "\0\0"
+END = "\1\1"
+GLOB_SPECIAL = re.compile(r"\[[^\]]*\]|[*?]")
+
+
+def _trigrams(text):
+    return {text[i:i + 3] for i in range(len(text) - 2)}
+
+
+def _name_grams(name):
+    # Trigrams of the padded name, plus every character and pair of characters
+    # so one- and two-letter queries have postings of their own
+    grams = _trigrams(PAD + name + END)
+    grams.update(name)
+    grams.update(name[i:i + 2] for i in range(len(name) - 1))
+    return grams
+
+
+def _query_grams(text):
+    return {text} if 0 < len(text) < 3 else _trigrams(text)
+
+
+class NameIndex:
+    # Trigram index over lowercased basenames. Each distinct name is indexed
+    # once and maps to every path that carries it; queries intersect the
+    # posting sets of the query's grams and verify the few survivors.
+    def __init__(self):
+        self._paths = {}
+        self._grams = {}
+
+    def __len__(self):
+        return sum(len(paths) for paths in self._paths.values())
+
+    def add(self, path):
+        name = os.path.basename(path).lower()
+        paths = self._paths.get(name)
+        if paths is None:
+            paths = self._paths[name] = set()
+            for gram in _name_grams(name):
+                self._grams.setdefault(gram, set()).add(name)
+        paths.add(path)
+
+    def remove(self, path):
+        name = os.path.basename(path).lower()
+        paths = self._paths.get(name)
+        if paths is None:
+            return
+        paths.discard(path)
+        if not paths:
+            del self._paths[name]
+            for gram in _name_grams(name):
+                names = self._grams.get(gram)
+                if names is not None:
+                    names.discard(name)
+                    if not names:
+                        del self._grams[gram]
+
+    def clear(self):
+        self._paths.clear()
+        self._grams.clear()
+
+    def _candidates(self, grams):
+        # Lazily yields names containing every gram, walking the shortest posting
+        # and probing the others, so a limited search stops early; None when the
+        # query has no grams to use
+        if not grams:
+            return None
+        postings = []
+        for gram in grams:
+            names = self._grams.get(gram)
+            if not names:
+                return ()
+            postings.append(names)
+        postings.sort(key=len)
+        first, rest = postings[0], postings[1:]
+        return (name for name in first if all(name in names for names in rest))
+
+    def _matcher(self, query, mode):
+        # (grams every match contains, predicate that verifies a candidate)
+        if mode == "prefix":
+            return _trigrams(PAD + query), lambda name: name.startswith(query)
+        if mode == "substring":
+            return _query_grams(query), lambda name: query in name
+        if mode == "glob":
+            pattern = re.compile(fnmatch.translate(query), re.DOTALL)
+            literals = GLOB_SPECIAL.split(query)
+            if len(literals) == 1:
+                return _trigrams(PAD + query + END), pattern.match
+            grams = set()
+            # Literals at either end pin the name's prefix or suffix
+            if literals[0]:
+                grams |= _trigrams(PAD + literals[0])
+            if literals[-1]:
+                grams |= _trigrams(literals[-1] + END)
+            for literal in literals[1:-1]:
+                grams |= _query_grams(literal)
+            return grams, pattern.match
+        raise ValueError(f"Unknown search mode: {mode}")
+
+    def search(self, query, mode="substring", limit=100):
+        # Ranks exact names first, then prefixes, then the rest by where the query
+        # falls and by length. Buckets fill in that order; with a limit the scan
+        # stops once enough paths are found, so within the last bucket used the
+        # matches are the first found rather than the best.
+        lowered = query.lower()
+        grams, matches = self._matcher(lowered, mode)
+        found = []
+        seen = set()
+
+        def take(names, prefix_only=False):
+            for name in names:
+                if name in seen or (prefix_only and not name.startswith(lowered)) or not matches(name):
+                    continue
+                seen.add(name)
+                if name == lowered:
+                    rank = 0
+                elif name.startswith(lowered):
+                    rank = 1
+                else:
+                    rank = 2
+                position = name.find(lowered)
+                for path in self._paths[name]:
+                    found.append((rank, position if position >= 0 else len(name), len(name), path))
+                if limit is not None and len(found) >= limit:
+                    return True
+            return False
+
+        done = lowered in self._paths and take([lowered])
+        if not done and lowered:
+            prefixed = self._candidates(_trigrams(PAD + lowered))
+            done = take(prefixed, prefix_only=True)
+        if not done and mode != "prefix":
+            candidates = self._candidates(grams)
+            # A query with no grams to use scans the distinct names, not the paths
+            take(self._paths if candidates is None else candidates)
+        elif not done and not lowered:
+            take(self._paths)
+        found.sort()
+        return [entry[3] for entry in found[:limit]]
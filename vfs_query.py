@@ -0,0 +1,42 @@
+### vfs_query.py
+import bisect
+from itertools import islice
+
+# Numeric metadata fields that have a sorted secondary index
+QUERY_FIELDS = ("size", "ctime", "mtime")
+
+
+class SortedIndex:
+    # (value, path) pairs kept in sorted order, so a range of values is two
+    # bisections away and iterating a slice yields paths ordered by value
+    def __init__(self, items=()):
+        self._items = sorted(items)
+
+    def __len__(self):
+        return len(self._items)
+
+    def add(self, value, path):
+        bisect.insort(self._items, (value, path))
+
+    def remove(self, value, path):
+        i = bisect.bisect_left(self._items, (value, path))
+        if i < len(self._items) and self._items[i] == (value, path):
+            del self._items[i]
+
+    def span(self, low=None, high=None):
+        # Positions of the values in [low, high); None leaves that end open
+        start = 0 if low is None else bisect.bisect_left(self._items, (low,))
+        stop = len(self._items) if high is None else bisect.bisect_left(self._items, (high,))
+        return start, max(start, stop)
+
+    def items(self, start, stop):
+        return self._items[start:stop]
+
+
+def in_range(value, bounds):
+    low, high = bounds
+    return (low is None or value >= low) and (high is None or value < high)
+
+
+def paginate(results, offset=0, limit=None):
+    return islice(results, offset, None if limit is None else offset + limit)
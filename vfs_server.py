@@ -0,0 +1,329 @@
+### vfs_server.py
+# Serves one VFS root to local tools over HTTP/1.1 with keep-alive:
+#   POST /call             {"op": ..., "args": {...}}  -> {"ok": ..., "result": ...}
+#   POST /batch            [{"op": ..., "args": {...}}, ...] -> list of results
+#   GET  /files/<name>     streams the file body
+#   PUT  /files/<name>     streams a new body in (?create=1 for new files)
+# Every client shares the server's VFS, so its stat, content and mmap caches
+# are warm for everyone. Requests must name this host (so a web page cannot
+# reach the server through DNS rebinding), POSTs must be application/json (so a
+# page cannot send them cross-origin without a preflight), and when the server
+# has a token every request must carry it in X-VFS-Token.
+import os
+import hmac
+import json
+import base64
+import logging
+import argparse
+import http.client
+import threading
+from urllib.parse import quote, unquote, urlsplit, parse_qs
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from vfs_core import VFS, CHUNK_SIZE
+
+DEFAULT_PORT = 8765
+LOCAL_HOSTS = {"127.0.0.1", "localhost", "::1"}
+TOKEN_HEADER = "X-VFS-Token"
+
+OPERATIONS = {
+    "create_file", "read_file", "read_range", "update_file", "delete_file", "stat",
+    "search_files", "list_files", "get_file_versions", "read_version", "restore_version",
+    "version_metrics", "list_trashed_files", "restore_file", "permanently_delete_file",
+    "purge_trash", "cache_stats",
+}
+
+# Exceptions the client raises again under their own type
+ERRORS = {error.__name__: error for error in (FileNotFoundError, FileExistsError, PermissionError, ValueError, KeyError)}
+
+
+def _jsonable(value):
+    if isinstance(value, bytes):
+        return {"base64": base64.b64encode(value).decode("ascii")}
+    if isinstance(value, os.stat_result):
+        return {field: getattr(value, field) for field in dir(value) if field.startswith("st_")}
+    if isinstance(value, (list, tuple)):
+        return [_jsonable(item) for item in value]
+    if isinstance(value, dict):
+        return {key: _jsonable(item) for key, item in value.items()}
+    return value
+
+
+def _from_json(value):
+    if isinstance(value, dict):
+        if set(value) == {"base64"}:
+            return base64.b64decode(value["base64"])
+        return {key: _from_json(item) for key, item in value.items()}
+    if isinstance(value, list):
+        return [_from_json(item) for item in value]
+    return value
+
+
+class VFSRequestHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, format, *args):
+        logging.debug("%s - %s", self.address_string(), format % args)
+
+    @property
+    def vfs(self):
+        return self.server.vfs
+
+    def _send_json(self, status, body):
+        data = json.dumps(body).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def _read_body(self):
+        length = int(self.headers.get("Content-Length", 0))
+        return self.rfile.read(length)
+
+    def _iter_body(self):
+        # Request bodies arrive either with a length or in chunked encoding
+        if self.headers.get("Transfer-Encoding", "").lower() == "chunked":
+            while True:
+                size = int(self.rfile.readline().split(b";")[0], 16)
+                if size == 0:
+                    self.rfile.readline()
+                    return
+                yield self.rfile.read(size)
+                self.rfile.readline()
+        remaining = int(self.headers.get("Content-Length", 0))
+        while remaining:
+            data = self.rfile.read(min(CHUNK_SIZE, remaining))
+            if not data:
+                return
+            remaining -= len(data)
+            yield data
+
+    def _file_name(self, path):
+        file_name, _ = self.vfs.resolve_path(unquote(path[len("/files/"):]))
+        return file_name
+
+    def _allowed(self):
+        # Host header check, then the shared token when the server has one
+        host = urlsplit("//" + self.headers.get("Host", "")).hostname
+        if host not in self.server.allowed_hosts:
+            self._send_json(403, {"ok": False, "error": "PermissionError", "message": f"Host '{host}' is not allowed."})
+            return False
+        token = self.server.token
+        if token is not None and not hmac.compare_digest(self.headers.get(TOKEN_HEADER, ""), token):
+            self._send_json(403, {"ok": False, "error": "PermissionError", "message": "Missing or wrong token."})
+            return False
+        return True
+
+    def _dispatch(self, call):
+        if not isinstance(call, dict):
+            raise ValueError("Expected a JSON object.")
+        op = call.get("op")
+        if op not in OPERATIONS:
+            raise ValueError(f"Unknown operation '{op}'.")
+        args = _from_json(call.get("args") or {})
+        return _jsonable(getattr(self.vfs, op)(**args))
+
+    def _outcome(self, call):
+        try:
+            return {"ok": True, "result": self._dispatch(call)}
+        except Exception as e:
+            return {"ok": False, "error": type(e).__name__, "message": str(e)}
+
+    def do_POST(self):
+        content_type = self.headers.get("Content-Type", "").split(";")[0].strip().lower()
+        if content_type != "application/json":
+            # Drain the body so the connection can be reused
+            self._read_body()
+            self._send_json(415, {"ok": False, "error": "ValueError", "message": "Expected application/json."})
+            return
+        if not self._allowed():
+            self._read_body()
+            return
+        try:
+            body = json.loads(self._read_body() or b"null")
+        except ValueError as e:
+            self._send_json(400, {"ok": False, "error": "ValueError", "message": str(e)})
+            return
+        expected = {"/call": dict, "/batch": list}.get(self.path)
+        if expected is not None and not isinstance(body, expected):
+            message = "Expected a JSON object." if expected is dict else "Expected a JSON array."
+            self._send_json(400, {"ok": False, "error": "ValueError", "message": message})
+            return
+        if self.path == "/call":
+            self._send_json(200, self._outcome(body))
+        elif self.path == "/batch":
+            # Calls run in order; one failing does not stop the ones after it
+            self._send_json(200, [self._outcome(call) for call in body])
+        else:
+            self._send_json(404, {"ok": False, "error": "FileNotFoundError", "message": self.path})
+
+    def do_GET(self):
+        if not self._allowed():
+            return
+        url = urlsplit(self.path)
+        if not url.path.startswith("/files/"):
+            self._send_json(404, {"ok": False, "error": "FileNotFoundError", "message": url.path})
+            return
+        try:
+            file_name = self._file_name(url.path)
+            size = self.vfs.stat(file_name).st_size
+            chunks = self.vfs.read_chunks(file_name)
+        except Exception as e:
+            self._send_json(404 if isinstance(e, FileNotFoundError) else 400,
+                            {"ok": False, "error": type(e).__name__, "message": str(e)})
+            return
+        # The handle was opened before the headers, so the body is one version
+        self.send_response(200)
+        self.send_header("Content-Type", "application/octet-stream")
+        self.send_header("Transfer-Encoding", "chunked")
+        self.send_header("X-File-Size", str(size))
+        self.end_headers()
+        try:
+            for chunk in chunks:
+                self.wfile.write(b"%x\r\n%s\r\n" % (len(chunk), chunk))
+            self.wfile.write(b"0\r\n\r\n")
+        except ConnectionError:
+            # The client stopped reading mid-body
+            self.close_connection = True
+        finally:
+            chunks.close()
+
+    def do_PUT(self):
+        if not self._allowed():
+            for _ in self._iter_body():
+                pass
+            return
+        url = urlsplit(self.path)
+        if not url.path.startswith("/files/"):
+            self._send_json(404, {"ok": False, "error": "FileNotFoundError", "message": url.path})
+            return
+        body = self._iter_body()
+        try:
+            file_name = self._file_name(url.path)
+            if parse_qs(url.query).get("create") == ["1"]:
+                self.vfs.create_file_stream(file_name, body)
+            else:
+                self.vfs.update_file_stream(file_name, body)
+        except Exception as e:
+            # Drain what is left so the connection can be reused
+            for _ in body:
+                pass
+            self._send_json(200, {"ok": False, "error": type(e).__name__, "message": str(e)})
+            return
+        self._send_json(200, {"ok": True, "result": None})
+
+
+class VFSServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, vfs, host="127.0.0.1", port=DEFAULT_PORT, token=None):
+        super().__init__((host, port), VFSRequestHandler)
+        self.vfs = vfs
+        self.token = token
+        self.allowed_hosts = LOCAL_HOSTS | {host}
+
+    def start(self):
+        thread = threading.Thread(target=self.serve_forever, name="vfs-server", daemon=True)
+        thread.start()
+        return thread
+
+
+class VFSClient:
+    # Talks to a VFSServer over one persistent connection. Any operation in
+    # OPERATIONS can be called as a method; batch() sends several in one request.
+    def __init__(self, host="127.0.0.1", port=DEFAULT_PORT, timeout=60, token=None):
+        self._conn = http.client.HTTPConnection(host, port, timeout=timeout)
+        self._lock = threading.Lock()
+        self._token = token
+
+    def _request(self, method, path, body=None, headers=None, **kwargs):
+        headers = dict(headers or {})
+        if self._token is not None:
+            headers[TOKEN_HEADER] = self._token
+        self._conn.request(method, path, body=body, headers=headers, **kwargs)
+        return self._conn.getresponse()
+
+    def _result(self, outcome):
+        if outcome["ok"]:
+            return _from_json(outcome["result"])
+        raise ERRORS.get(outcome["error"], RuntimeError)(outcome["message"])
+
+    def _post(self, path, payload):
+        with self._lock:
+            response = self._request("POST", path, json.dumps(payload).encode("utf-8"),
+                                     {"Content-Type": "application/json"})
+            return json.loads(response.read())
+
+    def call(self, op, **args):
+        return self._result(self._post("/call", {"op": op, "args": _jsonable(args)}))
+
+    def __getattr__(self, op):
+        if op not in OPERATIONS:
+            raise AttributeError(op)
+        return lambda **args: self.call(op, **args)
+
+    def batch(self, calls, raise_errors=False):
+        # calls is a list of (op, args) pairs; failed calls come back as the
+        # exception instance unless raise_errors is set
+        outcomes = self._post("/batch", [{"op": op, "args": _jsonable(args)} for op, args in calls])
+        results = []
+        for outcome in outcomes:
+            try:
+                results.append(self._result(outcome))
+            except Exception as e:
+                if raise_errors:
+                    raise
+                results.append(e)
+        return results
+
+    def read_chunks(self, file_name, chunk_size=CHUNK_SIZE):
+        # The connection stays busy until the generator is exhausted or closed
+        with self._lock:
+            response = self._request("GET", "/files/" + quote(file_name))
+            if response.status != 200:
+                self._result(json.loads(response.read()))
+            try:
+                while True:
+                    data = response.read(chunk_size)
+                    if not data:
+                        break
+                    yield data
+            finally:
+                if not response.isclosed():
+                    # Abandoned mid-body; reconnect on the next request
+                    self._conn.close()
+
+    def write_stream(self, file_name, chunks, create=False):
+        path = "/files/" + quote(file_name) + ("?create=1" if create else "")
+        body = (chunk.encode("utf-8") if isinstance(chunk, str) else chunk for chunk in chunks)
+        with self._lock:
+            response = self._request("PUT", path, body, encode_chunked=True)
+            return self._result(json.loads(response.read()))
+
+    def close(self):
+        self._conn.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Serve a VFS root to local clients")
+    parser.add_argument("--root", default=os.getcwd())
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT)
+    parser.add_argument("--token", default=os.environ.get("VFS_TOKEN"),
+                        help="require this token from clients (default: $VFS_TOKEN)")
+    args = parser.parse_args()
+
+    vfs = VFS(args.root)
+    server = VFSServer(vfs, args.host, args.port, args.token)
+    print(f"Serving {args.root} on http://{args.host}:{server.server_port}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        vfs.close()
+
+
+if __name__ == "__main__":
+    main()
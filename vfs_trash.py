@@ -0,0 +1,162 @@
+### vfs_trash.py
+import os
+import time
+import logging
+import threading
+from vfs_db import Database
+from vfs_copy import move_file
+
+TRASH_SCHEMA = """
+CREATE TABLE IF NOT EXISTS trash (
+    trash_id INTEGER PRIMARY KEY AUTOINCREMENT,
+    original_name TEXT NOT NULL,
+    deleted_at REAL NOT NULL,
+    size INTEGER NOT NULL,
+    location TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS trash_by_age ON trash (deleted_at);
+CREATE TABLE IF NOT EXISTS meta (
+    key TEXT PRIMARY KEY,
+    value TEXT
+);
+"""
+
+
+class TrashStore:
+    # Trashed files are kept under .trash/files/<trash_id>; the manifest records
+    # where each one came from, so listing and restoring never scan the directory.
+    def __init__(self, trash_dir):
+        self.trash_dir = trash_dir
+        self.files_dir = os.path.join(trash_dir, "files")
+        self.db = Database(os.path.join(trash_dir, "manifest.db"), TRASH_SCHEMA)
+        self._migrated = False
+        self._migrate_lock = threading.Lock()
+
+    def _index(self):
+        if not self._migrated:
+            with self._migrate_lock:
+                if not self._migrated:
+                    self._migrate()
+                    self._migrated = True
+        return self.db
+
+    def _migrate(self):
+        # One-time import of entries trashed as "<name>__<epoch>" files
+        with self.db.transaction() as conn:
+            if conn.execute("SELECT 1 FROM meta WHERE key = 'migrated'").fetchone():
+                return
+            for fname in os.listdir(self.trash_dir):
+                path = os.path.join(self.trash_dir, fname)
+                original_name, sep, stamp = fname.rpartition("__")
+                if not sep or not stamp.isdigit() or not os.path.isfile(path):
+                    continue
+                conn.execute(
+                    "INSERT INTO trash (original_name, deleted_at, size, location) VALUES (?, ?, ?, ?)",
+                    (original_name, int(stamp), os.path.getsize(path), fname),
+                )
+            conn.execute("INSERT INTO meta VALUES ('migrated', '1')")
+
+    def trash(self, file_name, file_path):
+        os.makedirs(self.files_dir, exist_ok=True)
+        with self._index().transaction() as conn:
+            cursor = conn.execute(
+                "INSERT INTO trash (original_name, deleted_at, size, location) VALUES (?, ?, ?, '')",
+                (file_name, time.time(), os.path.getsize(file_path)),
+            )
+            trash_id = cursor.lastrowid
+            location = os.path.join("files", str(trash_id))
+            conn.execute("UPDATE trash SET location = ? WHERE trash_id = ?", (location, trash_id))
+            move_file(file_path, os.path.join(self.trash_dir, location))
+        return trash_id
+
+    def get_entry(self, trash_id):
+        row = self._index().execute("SELECT * FROM trash WHERE trash_id = ?", (trash_id,)).fetchone()
+        return dict(row) if row else None
+
+    def list_entries(self, offset=0, limit=None):
+        rows = self._index().execute(
+            "SELECT * FROM trash ORDER BY deleted_at DESC, trash_id DESC LIMIT ? OFFSET ?",
+            (-1 if limit is None else limit, offset),
+        )
+        return [dict(row) for row in rows]
+
+    def restore(self, trash_id, root_directory):
+        with self._index().transaction() as conn:
+            entry = self.get_entry(trash_id)
+            if entry is None:
+                raise FileNotFoundError("Trashed file not found.")
+            source = os.path.join(self.trash_dir, entry["location"])
+            if not os.path.exists(source):
+                raise FileNotFoundError("Trashed file not found.")
+            dest = os.path.join(root_directory, entry["original_name"])
+            os.makedirs(os.path.dirname(dest), exist_ok=True)
+            conn.execute("DELETE FROM trash WHERE trash_id = ?", (trash_id,))
+            move_file(source, dest)
+        return entry["original_name"]
+
+    def remove(self, trash_id):
+        with self._index().transaction() as conn:
+            entry = self.get_entry(trash_id)
+            if entry is None:
+                return False
+            conn.execute("DELETE FROM trash WHERE trash_id = ?", (trash_id,))
+            target = os.path.join(self.trash_dir, entry["location"])
+            if os.path.exists(target):
+                os.remove(target)
+        return True
+
+    def total_size(self):
+        return self._index().execute("SELECT COALESCE(SUM(size), 0) FROM trash").fetchone()[0]
+
+    def purge(self, max_age=None, max_bytes=None, limit=100):
+        # Removes at most `limit` of the oldest entries that break a retention
+        # limit, so each call only holds the manifest lock briefly
+        db = self._index()
+        purged = 0
+        if max_age is not None:
+            rows = db.execute(
+                "SELECT trash_id FROM trash WHERE deleted_at < ? ORDER BY deleted_at LIMIT ?",
+                (time.time() - max_age, limit),
+            ).fetchall()
+            for row in rows:
+                purged += self.remove(row["trash_id"])
+        if max_bytes is not None and purged < limit:
+            excess = self.total_size() - max_bytes
+            if excess > 0:
+                rows = db.execute(
+                    "SELECT trash_id, size FROM trash ORDER BY deleted_at LIMIT ?",
+                    (limit - purged,),
+                ).fetchall()
+                for row in rows:
+                    if excess <= 0:
+                        break
+                    if self.remove(row["trash_id"]):
+                        purged += 1
+                        excess -= row["size"]
+        return purged
+
+
+class TrashPurger(threading.Thread):
+    # Background thread that enforces the trash retention limits a batch at a time
+    def __init__(self, store, max_age=None, max_bytes=None, interval=60, batch_size=100):
+        super().__init__(name="trash-purger", daemon=True)
+        self.store = store
+        self.max_age = max_age
+        self.max_bytes = max_bytes
+        self.interval = interval
+        self.batch_size = batch_size
+        self._stop_event = threading.Event()
+
+    def run(self):
+        while not self._stop_event.is_set():
+            try:
+                purged = self.store.purge(self.max_age, self.max_bytes, self.batch_size)
+            except Exception as e:
+                logging.error(f"Trash purge failed: {e}")
+                purged = 0
+            # Keep going without waiting while a full batch was purged
+            if purged < self.batch_size:
+                self._stop_event.wait(self.interval)
+
+    def stop(self):
+        self._stop_event.set()
@@ -0,0 +1,318 @@
+### vfs_versions.py
+import os
+import re
+import json
+import time
+import hashlib
+import zlib
+import difflib
+import threading
+from contextlib import contextmanager
+from vfs_db import Database
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
+CHUNK_SIZE = 64 * 1024
+KEYFRAME_INTERVAL = 16
+DELTA_MAX_BYTES = 16 * 1024 * 1024
+LOCK_STRIPES = 64
+
+INDEX_LAYOUT = 2
+VERSIONS_TABLE = """
+CREATE TABLE IF NOT EXISTS versions (
+    file_name TEXT NOT NULL,
+    seq INTEGER NOT NULL,
+    version_id TEXT NOT NULL,
+    created REAL NOT NULL,
+    size INTEGER NOT NULL,
+    location TEXT NOT NULL,
+    kind TEXT NOT NULL,
+    PRIMARY KEY (file_name, seq)
+) WITHOUT ROWID;
+CREATE UNIQUE INDEX IF NOT EXISTS versions_by_id ON versions (version_id);
+"""
+INDEX_SCHEMA = VERSIONS_TABLE + """
+CREATE TABLE IF NOT EXISTS meta (
+    key TEXT PRIMARY KEY,
+    value TEXT
+);
+"""
+
+LEGACY_VERSION = re.compile(r"^(.*)_v(\d{14})(.*)$")
+
+
+class VersionStore:
+    # Content-addressed version storage: every version is a small JSON manifest
+    # listing the sha256 digests of its chunks; chunks live once under objects/.
+    # Versions are either full keyframes or line deltas against the previous
+    # version, with a keyframe at least every `keyframe_interval` versions.
+    def __init__(self, versions_dir, chunk_size=CHUNK_SIZE,
+                 keyframe_interval=KEYFRAME_INTERVAL, delta_max_bytes=DELTA_MAX_BYTES):
+        self.versions_dir = versions_dir
+        self.objects_dir = os.path.join(versions_dir, "objects")
+        self.manifests_dir = os.path.join(versions_dir, "manifests")
+        self.locks_dir = os.path.join(versions_dir, "locks")
+        self.chunk_size = chunk_size
+        self.db = Database(os.path.join(versions_dir, "index.db"), INDEX_SCHEMA)
+        self._migrated = False
+        self._migrate_lock = threading.Lock()
+        self.keyframe_interval = keyframe_interval
+        self.delta_max_bytes = delta_max_bytes
+        self.metrics = {
+            "full_versions": 0,
+            "delta_versions": 0,
+            "logical_bytes": 0,
+            "stored_bytes": 0,
+            "restores": 0,
+            "restore_seconds": 0.0,
+            "restore_chain_length": 0,
+        }
+
+    def _index(self):
+        if not self._migrated:
+            with self._migrate_lock:
+                if not self._migrated:
+                    self._migrate()
+                    self._migrated = True
+        return self.db
+
+    def _migrate(self):
+        # Import manifests and legacy full copies whenever the index is missing
+        # or was written with an older layout
+        with self.db.transaction() as conn:
+            if conn.execute("PRAGMA user_version").fetchone()[0] >= INDEX_LAYOUT:
+                return
+            conn.execute("DROP TABLE IF EXISTS versions")
+            for statement in VERSIONS_TABLE.split(";"):
+                if statement.strip():
+                    conn.execute(statement)
+            rows = []
+            for fname in os.listdir(self.versions_dir):
+                match = LEGACY_VERSION.match(fname)
+                path = os.path.join(self.versions_dir, fname)
+                if match and os.path.isfile(path):
+                    stats = os.stat(path)
+                    rows.append((None, match.group(1) + match.group(3), fname, stats.st_mtime,
+                                 stats.st_size, fname, "legacy"))
+            for root, _, files in os.walk(self.manifests_dir):
+                for fname in files:
+                    if not fname.endswith(".json"):
+                        continue
+                    path = os.path.join(root, fname)
+                    version_name = os.path.relpath(path, self.manifests_dir)[:-len(".json")]
+                    with open(path, "r") as file:
+                        manifest = json.load(file)
+                    rows.append((manifest.get("seq"), manifest["file"], version_name, manifest["created"],
+                                 manifest["size"], os.path.relpath(path, self.versions_dir),
+                                 manifest.get("type", "full")))
+            # Manifests from before sequence numbers sort by their timestamped names
+            rows.sort(key=lambda row: (row[0] is not None, row[0] or 0, row[2]))
+            next_seq = {}
+            for seq, file_name, version_name, created, size, location, kind in rows:
+                seq = max(seq or 0, next_seq.get(file_name, 1))
+                next_seq[file_name] = seq + 1
+                conn.execute(
+                    "INSERT INTO versions VALUES (?, ?, ?, ?, ?, ?, ?)",
+                    (file_name, seq, version_name, created, size, location, kind),
+                )
+            conn.execute(f"PRAGMA user_version = {INDEX_LAYOUT}")
+
+    def transaction(self):
+        return self._index().transaction()
+
+    @contextmanager
+    def file_lock(self, file_name):
+        # Cross-process lock for one file's versions, held while its current
+        # content is snapshotted and replaced so concurrent updaters each version
+        # what they overwrite. Names share LOCK_STRIPES lock files; without flock
+        # the whole index write lock stands in.
+        if fcntl is None:
+            with self.transaction():
+                yield
+            return
+        os.makedirs(self.locks_dir, exist_ok=True)
+        stripe = zlib.crc32(file_name.encode("utf-8")) % LOCK_STRIPES
+        with open(os.path.join(self.locks_dir, f"{stripe:02d}.lock"), "ab") as file:
+            fcntl.flock(file.fileno(), fcntl.LOCK_EX)
+            yield
+
+    def _object_path(self, digest):
+        return os.path.join(self.objects_dir, digest[:2], digest[2:])
+
+    def _manifest_path(self, version_name):
+        return os.path.join(self.manifests_dir, version_name + ".json")
+
+    def _write_atomic(self, path, data):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp_path, "wb") as file:
+            file.write(data)
+        os.replace(tmp_path, path)
+
+    def write_chunk(self, data):
+        digest = hashlib.sha256(data).hexdigest()
+        path = self._object_path(digest)
+        # Identical chunks hash to the same object, so they are only written once
+        if not os.path.exists(path):
+            self._write_atomic(path, data)
+            self.metrics["stored_bytes"] += len(data)
+        return digest
+
+    def write_chunks(self, data):
+        return [self.write_chunk(data[i:i + self.chunk_size])
+                for i in range(0, len(data), self.chunk_size)]
+
+    def read_chunk(self, digest):
+        with open(self._object_path(digest), "rb") as file:
+            return file.read()
+
+    def snapshot(self, file_name, file_path):
+        # Chunks and deltas are written outside any transaction; only allocating
+        # the sequence number and recording the manifest take the index write lock,
+        # so snapshots of different files do not wait on each other's I/O
+        base_name = self.latest_version(file_name)
+        base_manifest = self.load_manifest(base_name) if base_name else None
+        size = os.path.getsize(file_path)
+        manifest = None
+        if (base_manifest is not None
+                and base_manifest.get("depth", 0) + 1 < self.keyframe_interval
+                and size <= self.delta_max_bytes
+                and base_manifest["size"] <= self.delta_max_bytes):
+            with open(file_path, "rb") as file:
+                data = file.read()
+            manifest = self._make_delta(base_name, base_manifest, data)
+        if manifest is None:
+            manifest = self._make_full(file_path)
+        manifest["file"] = file_name
+        with self.transaction() as conn:
+            row = conn.execute(
+                "SELECT MAX(seq) FROM versions WHERE file_name = ?", (file_name,)
+            ).fetchone()
+            seq = (row[0] or 0) + 1
+            base, ext = os.path.splitext(file_name)
+            version_name = f"{base}_v{seq:06d}{ext}"
+            manifest["seq"] = seq
+            manifest["created"] = time.time()
+            encoded = json.dumps(manifest).encode("utf-8")
+            manifest_path = self._manifest_path(version_name)
+            self._write_atomic(manifest_path, encoded)
+            conn.execute(
+                "INSERT INTO versions VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (file_name, seq, version_name, manifest["created"], manifest["size"],
+                 os.path.relpath(manifest_path, self.versions_dir), manifest["type"]),
+            )
+        self.metrics["full_versions" if manifest["type"] == "full" else "delta_versions"] += 1
+        self.metrics["logical_bytes"] += manifest["size"]
+        self.metrics["stored_bytes"] += len(encoded)
+        return version_name
+
+    def _make_full(self, file_path):
+        chunks = []
+        size = 0
+        with open(file_path, "rb") as file:
+            while True:
+                data = file.read(self.chunk_size)
+                if not data:
+                    break
+                chunks.append(self.write_chunk(data))
+                size += len(data)
+        return {"type": "full", "depth": 0, "size": size, "chunks": chunks}
+
+    def _make_delta(self, base_name, base_manifest, data):
+        old_lines = self.read_version(base_name, record=False).splitlines(keepends=True)
+        new_lines = data.splitlines(keepends=True)
+        ops = []
+        inserted = 0
+        matcher = difflib.SequenceMatcher(None, old_lines, new_lines)
+        for tag, i1, i2, j1, j2 in matcher.get_opcodes():
+            if tag == "equal":
+                ops.append(["copy", i1, i2])
+            elif j2 > j1:
+                literal = b"".join(new_lines[j1:j2])
+                ops.append(["insert", self.write_chunks(literal)])
+                inserted += len(literal)
+        # A delta that rewrites most of the file is not worth a longer chain
+        if inserted * 2 > len(data):
+            return None
+        return {
+            "type": "delta",
+            "base": base_name,
+            "depth": base_manifest.get("depth", 0) + 1,
+            "size": len(data),
+            "ops": ops,
+        }
+
+    def version_info(self, version_name):
+        row = self._index().execute(
+            "SELECT * FROM versions WHERE version_id = ? LIMIT 1", (version_name,)
+        ).fetchone()
+        return dict(row) if row else None
+
+    def load_manifest(self, version_name):
+        manifest_path = self._manifest_path(version_name)
+        if not os.path.exists(manifest_path):
+            raise FileNotFoundError(f"Version '{version_name}' does not exist.")
+        with open(manifest_path, "r") as file:
+            return json.load(file)
+
+    def read_version(self, version_name, record=True):
+        started = time.perf_counter()
+        info = self.version_info(version_name)
+        if info is not None and info["kind"] == "legacy":
+            with open(os.path.join(self.versions_dir, info["location"]), "rb") as file:
+                return file.read()
+        chain = [self.load_manifest(version_name)]
+        while chain[-1].get("type", "full") == "delta":
+            chain.append(self.load_manifest(chain[-1]["base"]))
+        keyframe = chain.pop()
+        data = b"".join(self.read_chunk(digest) for digest in keyframe["chunks"])
+        # Replay deltas from the keyframe forward
+        for manifest in reversed(chain):
+            lines = data.splitlines(keepends=True)
+            parts = []
+            for op in manifest["ops"]:
+                if op[0] == "copy":
+                    parts.extend(lines[op[1]:op[2]])
+                else:
+                    parts.extend(self.read_chunk(digest) for digest in op[1])
+            data = b"".join(parts)
+        if record:
+            self.metrics["restores"] += 1
+            self.metrics["restore_seconds"] += time.perf_counter() - started
+            self.metrics["restore_chain_length"] += len(chain)
+        return data
+
+    def get_metrics(self):
+        metrics = dict(self.metrics)
+        versions = metrics["full_versions"] + metrics["delta_versions"]
+        restores = metrics["restores"]
+        metrics["keyframe_interval"] = self.keyframe_interval
+        metrics["storage_ratio"] = (metrics["stored_bytes"] / metrics["logical_bytes"]
+                                    if metrics["logical_bytes"] else 0.0)
+        metrics["avg_restore_seconds"] = metrics["restore_seconds"] / restores if restores else 0.0
+        metrics["avg_restore_chain_length"] = metrics["restore_chain_length"] / restores if restores else 0.0
+        metrics["delta_fraction"] = metrics["delta_versions"] / versions if versions else 0.0
+        return metrics
+
+    def latest_version(self, file_name):
+        row = self._index().execute(
+            "SELECT version_id FROM versions WHERE file_name = ? AND kind != 'legacy' "
+            "ORDER BY seq DESC LIMIT 1",
+            (file_name,),
+        ).fetchone()
+        return row["version_id"] if row else None
+
+    def list_versions(self, file_name, offset=0, limit=None):
+        rows = self._index().execute(
+            "SELECT * FROM versions WHERE file_name = ? ORDER BY seq LIMIT ? OFFSET ?",
+            (file_name, -1 if limit is None else limit, offset),
+        )
+        return [dict(row) for row in rows]
+
+    def count_versions(self, file_name):
+        return self._index().execute(
+            "SELECT COUNT(*) FROM versions WHERE file_name = ?", (file_name,)
+        ).fetchone()[0]
@@ -0,0 +1,348 @@
+### vfs_watch.py
+import os
+import sys
+import time
+import errno
+import struct
+import select
+import logging
+import threading
+import ctypes
+import ctypes.util
+
+IN_MODIFY = 0x00000002
+IN_ATTRIB = 0x00000004
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_FROM = 0x00000040
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_DELETE = 0x00000200
+IN_DELETE_SELF = 0x00000400
+IN_MOVE_SELF = 0x00000800
+IN_Q_OVERFLOW = 0x00004000
+IN_IGNORED = 0x00008000
+IN_ONLYDIR = 0x01000000
+IN_DONTFOLLOW = 0x02000000
+IN_ISDIR = 0x40000000
+
+WATCH_MASK = (IN_MODIFY | IN_ATTRIB | IN_CLOSE_WRITE | IN_MOVED_FROM | IN_MOVED_TO
+              | IN_CREATE | IN_DELETE | IN_DELETE_SELF | IN_MOVE_SELF | IN_ONLYDIR | IN_DONTFOLLOW)
+EVENT_HEADER = struct.Struct("iIII")
+# Files the polling fallback re-stats per pass, looking for edits in place
+STAT_BATCH = 4096
+
+# Watchers report changes to callback(event, path, dest=None) where event is one
+# of "created", "modified", "deleted", "moved", "created_dir", "deleted_dir",
+# "moved_dir" or "overflow" (the caller should rescan everything).
+
+
+def _load_libc():
+    if not sys.platform.startswith("linux"):
+        return None
+    try:
+        libc = ctypes.CDLL(ctypes.util.find_library("c") or "libc.so.6", use_errno=True)
+        libc.inotify_init1
+        return libc
+    except (OSError, AttributeError):
+        return None
+
+
+class InotifyWatcher(threading.Thread):
+    def __init__(self, root_directory, callback, ignored=()):
+        super().__init__(name="inotify-watcher", daemon=True)
+        self.root_directory = root_directory
+        self.callback = callback
+        self.ignored = set(ignored)
+        self._libc = _load_libc()
+        if self._libc is None:
+            raise OSError("inotify is not available on this platform.")
+        self._fd = self._libc.inotify_init1(os.O_NONBLOCK | os.O_CLOEXEC)
+        if self._fd < 0:
+            raise OSError(ctypes.get_errno(), "inotify_init1 failed")
+        self._paths = {}
+        self._wds = {}
+        try:
+            self._add_tree(root_directory)
+        except OSError:
+            os.close(self._fd)
+            raise
+        self._stop_r, self._stop_w = os.pipe()
+
+    def _add_watch(self, path):
+        wd = self._libc.inotify_add_watch(self._fd, os.fsencode(path), WATCH_MASK)
+        if wd < 0:
+            err = ctypes.get_errno()
+            if err == errno.ENOSPC:
+                raise OSError(err, "inotify watch limit reached")
+            return
+        self._paths[wd] = path
+        self._wds[path] = wd
+
+    def _add_tree(self, path):
+        self._add_watch(path)
+        for root, dirs, _ in os.walk(path):
+            dirs[:] = [d for d in dirs if d not in self.ignored]
+            for d in dirs:
+                self._add_watch(os.path.join(root, d))
+
+    def _forget_tree(self, path):
+        prefix = path + os.sep
+        for watched in [p for p in self._wds if p == path or p.startswith(prefix)]:
+            self._paths.pop(self._wds.pop(watched), None)
+
+    def _move_tree(self, old, new):
+        # Watches follow the inode, so only our bookkeeping needs renaming
+        prefix = old + os.sep
+        for watched in [p for p in self._wds if p == old or p.startswith(prefix)]:
+            wd = self._wds.pop(watched)
+            moved = new + watched[len(old):]
+            self._wds[moved] = wd
+            self._paths[wd] = moved
+
+    def run(self):
+        try:
+            while True:
+                ready, _, _ = select.select([self._fd, self._stop_r], [], [])
+                if self._stop_r in ready:
+                    break
+                try:
+                    data = os.read(self._fd, 64 * 1024)
+                except BlockingIOError:
+                    continue
+                self._dispatch(data)
+        finally:
+            os.close(self._fd)
+            os.close(self._stop_r)
+            os.close(self._stop_w)
+
+    def _dispatch(self, data):
+        moved_from = {}
+        offset = 0
+        while offset < len(data):
+            wd, mask, cookie, length = EVENT_HEADER.unpack_from(data, offset)
+            offset += EVENT_HEADER.size
+            name = os.fsdecode(data[offset:offset + length].rstrip(b"\0"))
+            offset += length
+            if mask & IN_Q_OVERFLOW:
+                self._emit("overflow", None)
+                continue
+            parent = self._paths.get(wd)
+            if parent is None or mask & IN_IGNORED:
+                continue
+            if not name:
+                # Events about the watched directory itself are reported by its parent
+                continue
+            if name in self.ignored:
+                continue
+            path = os.path.join(parent, name)
+            is_dir = bool(mask & IN_ISDIR)
+            if mask & IN_MOVED_FROM:
+                moved_from[cookie] = (path, is_dir)
+            elif mask & IN_MOVED_TO:
+                source = moved_from.pop(cookie, None)
+                if source is None:
+                    self._created(path, is_dir)
+                elif is_dir:
+                    self._move_tree(source[0], path)
+                    self._emit("moved_dir", source[0], path)
+                else:
+                    self._emit("moved", source[0], path)
+            elif mask & IN_CREATE:
+                self._created(path, is_dir)
+            elif mask & IN_DELETE:
+                if is_dir:
+                    self._forget_tree(path)
+                self._emit("deleted_dir" if is_dir else "deleted", path)
+            elif not is_dir and mask & (IN_MODIFY | IN_ATTRIB | IN_CLOSE_WRITE):
+                self._emit("modified", path)
+        # Moves whose other half is outside the tree are plain deletions
+        for path, is_dir in moved_from.values():
+            if is_dir:
+                self._forget_tree(path)
+            self._emit("deleted_dir" if is_dir else "deleted", path)
+
+    def _created(self, path, is_dir):
+        if is_dir:
+            try:
+                self._add_tree(path)
+            except OSError as e:
+                logging.error(f"Cannot watch {path}: {e}")
+                self._emit("overflow", None)
+                return
+            self._emit("created_dir", path)
+        else:
+            self._emit("created", path)
+
+    def _emit(self, event, path, dest=None):
+        try:
+            self.callback(event, path, dest)
+        except Exception as e:
+            logging.error(f"Failed to apply {event} event for {path}: {e}")
+
+    def stop(self):
+        os.write(self._stop_w, b"x")
+
+
+class PollingWatcher(threading.Thread):
+    # Fallback for platforms without inotify. Each pass stats every directory
+    # and rescans only those whose mtime moved (an entry was added, removed or
+    # renamed), then re-stats the next stat_batch files to catch edits in place.
+    # Inodes tell renames from delete + create. Passes are spaced at least as
+    # far apart as the previous one took, so a huge tree is never polled
+    # back to back.
+    def __init__(self, root_directory, callback, ignored=(), interval=2.0, stat_batch=STAT_BATCH):
+        super().__init__(name="polling-watcher", daemon=True)
+        self.root_directory = root_directory
+        self.callback = callback
+        self.ignored = set(ignored)
+        self.interval = interval
+        self.stat_batch = stat_batch
+        self._stop_event = threading.Event()
+        # directory -> (mtime_ns, file names, subdirectory names)
+        self._dirs = {}
+        # file path -> (inode, mtime_ns, size)
+        self._files = {}
+        self._rotation = iter(())
+        self._add_tree(self.root_directory, None)
+
+    def _list(self, directory):
+        # The mtime is read first, so a change made during the listing shows up next pass
+        try:
+            mtime_ns = os.stat(directory).st_mtime_ns
+            entries = list(os.scandir(directory))
+        except OSError:
+            return None
+        files, subdirs = {}, set()
+        for entry in entries:
+            try:
+                if entry.is_dir(follow_symlinks=False):
+                    if entry.name not in self.ignored:
+                        subdirs.add(entry.name)
+                elif entry.is_file():
+                    stats = entry.stat()
+                    files[entry.name] = (stats.st_ino, stats.st_mtime_ns, stats.st_size)
+            except OSError:
+                continue
+        return mtime_ns, files, subdirs
+
+    def _add_tree(self, directory, created):
+        listing = self._list(directory)
+        if listing is None:
+            return
+        mtime_ns, files, subdirs = listing
+        for name, identity in files.items():
+            path = os.path.join(directory, name)
+            self._files[path] = identity
+            if created is not None:
+                created.append(path)
+        self._dirs[directory] = (mtime_ns, set(files), subdirs)
+        for name in subdirs:
+            self._add_tree(os.path.join(directory, name), created)
+
+    def _drop_tree(self, directory, removed):
+        entry = self._dirs.pop(directory, None)
+        if entry is None:
+            return
+        _, files, subdirs = entry
+        for name in files:
+            path = os.path.join(directory, name)
+            removed[self._files.pop(path)[0]] = path
+        for name in subdirs:
+            self._drop_tree(os.path.join(directory, name), removed)
+
+    def _rescan(self, directory, created, removed, modified):
+        listing = self._list(directory)
+        if listing is None:
+            # Gone; its parent's rescan drops it
+            return
+        mtime_ns, files, subdirs = listing
+        _, old_files, old_subdirs = self._dirs[directory]
+        for name in old_files - files.keys():
+            path = os.path.join(directory, name)
+            removed[self._files.pop(path)[0]] = path
+        for name, identity in files.items():
+            path = os.path.join(directory, name)
+            previous = self._files.get(path)
+            if previous is None:
+                created.append(path)
+            elif previous != identity:
+                modified.append(path)
+            self._files[path] = identity
+        self._dirs[directory] = (mtime_ns, set(files), subdirs)
+        for name in old_subdirs - subdirs:
+            self._drop_tree(os.path.join(directory, name), removed)
+        for name in subdirs - old_subdirs:
+            self._add_tree(os.path.join(directory, name), created)
+
+    def _check_files(self, modified):
+        # Files edited in place leave their directory's mtime alone
+        checked = 0
+        restarted = False
+        while checked < self.stat_batch:
+            path = next(self._rotation, None)
+            if path is None:
+                if restarted:
+                    break
+                self._rotation = iter(list(self._files))
+                restarted = True
+                continue
+            previous = self._files.get(path)
+            if previous is None:
+                continue
+            checked += 1
+            try:
+                stats = os.stat(path)
+            except OSError:
+                continue
+            identity = (stats.st_ino, stats.st_mtime_ns, stats.st_size)
+            if identity != previous:
+                self._files[path] = identity
+                modified.append(path)
+
+    def poll(self):
+        created, removed, modified = [], {}, []
+        for directory in list(self._dirs):
+            entry = self._dirs.get(directory)
+            if entry is None:
+                continue
+            try:
+                mtime_ns = os.stat(directory).st_mtime_ns
+            except OSError:
+                continue
+            if mtime_ns != entry[0]:
+                self._rescan(directory, created, removed, modified)
+        self._check_files(modified)
+        for path in created:
+            source = removed.pop(self._files[path][0], None) if path in self._files else None
+            if source is not None:
+                self._emit("moved", source, path)
+            else:
+                self._emit("created", path)
+        for path in removed.values():
+            self._emit("deleted", path)
+        for path in modified:
+            self._emit("modified", path)
+
+    def run(self):
+        wait = self.interval
+        while not self._stop_event.wait(wait):
+            started = time.monotonic()
+            self.poll()
+            wait = max(self.interval, time.monotonic() - started)
+
+    def _emit(self, event, path, dest=None):
+        try:
+            self.callback(event, path, dest)
+        except Exception as e:
+            logging.error(f"Failed to apply {event} event for {path}: {e}")
+
+    def stop(self):
+        self._stop_event.set()
+
+
+def create_watcher(root_directory, callback, ignored=(), poll_interval=2.0):
+    try:
+        return InotifyWatcher(root_directory, callback, ignored)
+    except OSError as e:
+        logging.info(f"Falling back to polling for {root_directory}: {e}")
+        return PollingWatcher(root_directory, callback, ignored, poll_interval)